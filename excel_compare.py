@@ -1,13 +1,1315 @@
 # 延迟导入重库（pandas），提升单文件启动速度
+import time
+_T_PROCESS_START = time.perf_counter()
 import importlib
+import threading
 pd = None  # runtime lazy import
 from PyQt5 import QtWidgets, QtGui, QtCore
-from PyQt5.QtWidgets import QFileDialog, QMessageBox, QFormLayout, QScrollArea, QWidget, QGroupBox, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QPushButton, QLabel, QLineEdit, QGridLayout, QComboBox
+from PyQt5.QtWidgets import QFileDialog, QMessageBox, QFormLayout, QScrollArea, QWidget, QGroupBox, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QPushButton, QLabel, QLineEdit, QGridLayout, QComboBox, QCheckBox
 from PyQt5.QtGui import QFont
 from PyQt5.QtWidgets import QGraphicsDropShadowEffect
 import sys
 import os
-from datetime import datetime
+import re
+import json
+import heapq
+import unicodedata
+import argparse
+import socket
+import socketserver
+from collections import OrderedDict, defaultdict
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait as futures_wait
+from concurrent.futures.process import BrokenProcessPool
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from datetime import datetime, date
+
+
+# 启动性能统计：命令行加 --profile-startup 或设置环境变量 EXCEL_COMPARE_PROFILE=1 开启
+PROFILE_STARTUP = '--profile-startup' in sys.argv or os.environ.get('EXCEL_COMPARE_PROFILE') == '1'
+_startup_stats = {}
+
+# 后台预热：窗口空闲后在后台线程导入 openpyxl / pandas，首次对比无需在界面线程同步导入
+_warmup_done = threading.Event()
+_warmup_thread = None
+_warmup_error = None
+
+
+def _profile_log(message: str):
+    """输出启动性能信息；打包后的窗口程序没有 stderr，则追加写入日志文件。"""
+    if not PROFILE_STARTUP:
+        return
+    line = f"[startup] {message}"
+    if sys.stderr is not None:
+        print(line, file=sys.stderr, flush=True)
+        return
+    try:
+        with open('ExcelCompare_startup.log', 'a', encoding='utf-8') as f:
+            f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S} {line}\n")
+    except Exception:
+        pass
+
+
+def start_heavy_warmup():
+    """在后台线程预加载 openpyxl 与 pandas（含 Excel 读取链路），重复调用无副作用。"""
+    global _warmup_thread
+    if _warmup_thread is not None:
+        return
+
+    def _run():
+        global pd, _warmup_error
+        t0 = time.perf_counter()
+        try:
+            # openpyxl 先导入：读取表头只依赖它，尽快释放其导入锁
+            importlib.import_module('openpyxl')
+            mod = importlib.import_module('pandas')
+            # read_excel 的 openpyxl 引擎在首次调用时才导入，这里一并预热
+            importlib.import_module('pandas.io.excel._openpyxl')
+            pd = mod
+        except Exception as e:
+            _warmup_error = e
+        finally:
+            _startup_stats['warmup'] = time.perf_counter() - t0
+            _profile_log(f"后台预热耗时 {_startup_stats['warmup']:.3f}s"
+                         + (f"（失败：{_warmup_error}）" if _warmup_error else ""))
+            _warmup_done.set()
+
+    _warmup_thread = threading.Thread(target=_run, name='heavy-warmup', daemon=True)
+    _warmup_thread.start()
+
+
+def wait_for_pandas(poll=None, interval: float = 0.05):
+    """返回 pandas 模块：预热进行中则等待其完成（期间周期调用 poll 保持界面响应），
+    未启动预热或预热失败时退回同步导入，以便抛出真实的导入错误。"""
+    global pd
+    if pd is not None:
+        return pd
+    if _warmup_thread is not None:
+        while not _warmup_done.wait(interval):
+            if poll is not None:
+                poll()
+        if pd is not None:
+            return pd
+    pd = importlib.import_module('pandas')
+    return pd
+
+
+class CompareError(Exception):
+    """对比参数或数据不满足要求（找不到索引列、没有有效对比列等），消息可直接展示给用户。"""
+
+    def __init__(self, message: str, kind: str = 'critical'):
+        super().__init__(message)
+        self.kind = kind  # 对应 QMessageBox 的提示级别：critical / warning
+
+
+def read_excel_header(file_path: str):
+    """仅读取 Excel 第一行作为列名，避免导入 pandas，提升启动与选择速度。"""
+    try:
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        ws = wb.active
+        row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True))
+        wb.close()
+        cols = []
+        for c in row:
+            if c is None:
+                continue
+            text = str(c).strip()
+            if text:
+                cols.append(text)
+        return cols
+    except Exception:
+        return []
+
+
+def unique_output_filename(base: str, ext: str = '.xlsx') -> str:
+    """返回不与现有文件重名的输出文件名；重名时追加计数后缀。"""
+    filename = f"{base}{ext}"
+    if os.path.exists(filename):
+        n = 1
+        while os.path.exists(f"{base}_{n}{ext}"):
+            n += 1
+        filename = f"{base}_{n}{ext}"
+    return filename
+
+
+# 统一归一化函数：去空白、去千分位、数字转为一致格式（避免 0 与 0.0 误判）
+def _normalize_series(s: 'pd.Series') -> 'pd.Series':
+    # 缺失值占位，避免与空字符串混淆
+    s = s.copy()
+    s = s.where(~s.isna(), other="__MISSING__")
+    # 转字符串并去除首尾空白
+    s_str = s.astype(str).str.strip()
+    # 去除可能的千分位逗号
+    s_clean = s_str.str.replace(',', '', regex=False)
+    # 能转数字的统一为数字格式，再转为字符串，去除多余的0和小数点
+    s_num = pd.to_numeric(s_clean, errors='coerce')
+    result = s_clean.copy()
+    mask = s_num.notna()
+    # 使用通用格式，最多15位有效数字，避免 1.0 与 1、以及 1.2300 与 1.23 的差异
+    result.loc[mask] = s_num.loc[mask].map(lambda x: f"{x:.15g}")
+    return result
+
+
+# 列名模糊匹配：归一化列名后用字符二元组倒排索引召回候选，避免全量两两比较
+_HEADER_STRIP_RE = re.compile(r"[\s_\-－—.,，。:：;；/\\|()（）\[\]【】{}<>《》'\"‘’“”]+")
+
+
+def normalize_header(name) -> str:
+    """列名归一化：全角转半角、转小写、去除空白与常见分隔符/括号，如 “Amount (USD)” 与 “amount_usd” 一致。"""
+    text = unicodedata.normalize('NFKC', str(name or '')).lower()
+    return _HEADER_STRIP_RE.sub('', text)
+
+
+def _header_grams(norm: str):
+    """带首尾边界的字符二元组；中文列名通常较短，二元组比三元组召回更稳定。"""
+    padded = f"^{norm}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def propose_column_pairs(left_cols, right_cols, min_score: float = 0.6, max_posting: int = 200, exclude=()):
+    """为两侧列名提出一对一的匹配建议，返回按相似度降序的 [{'col1', 'col2', 'score'}]。
+
+    exclude 为不再建议的 (col1, col2) 列名对（如用户已拒绝的建议），在分配前剔除，
+    这两列仍可与其他列配对。
+
+    相似度为二元组 Dice 系数，归一化后相同的列名得分为 1。
+    倒排索引只用于召回候选：出现在过多列名中的二元组（超过 max_posting 列）区分度低，不用来召回
+    （全是常见二元组时只用最少见的一个），保证数千列时仍然快速；候选的得分按全部二元组计算。
+    """
+    right_norm = [normalize_header(c) for c in right_cols]
+    right_grams = [_header_grams(n) for n in right_norm]
+    by_norm = {}
+    postings = defaultdict(list)
+    for j, (norm, grams) in enumerate(zip(right_norm, right_grams)):
+        by_norm.setdefault(norm, []).append(j)
+        for g in grams:
+            postings[g].append(j)
+
+    exclude = set(exclude)
+    candidates = []
+    for i, col in enumerate(left_cols):
+        norm = normalize_header(col)
+        if not norm:
+            continue
+        exact = [j for j in by_norm.get(norm, ()) if (col, right_cols[j]) not in exclude]
+        if exact:
+            candidates.extend((1.0, i, j) for j in exact)
+            continue
+        grams = _header_grams(norm)
+        found = sorted((postings[g] for g in grams if g in postings), key=len)
+        if not found:
+            continue
+        recall = set()
+        for posting in [p for p in found if len(p) <= max_posting] or found[:1]:
+            recall.update(posting)
+        for j in recall:
+            if (col, right_cols[j]) in exclude:
+                continue
+            score = 2.0 * len(grams & right_grams[j]) / (len(grams) + len(right_grams[j]))
+            if score >= min_score:
+                candidates.append((score, i, j))
+
+    # 贪心一对一分配：高分优先，同分按列顺序
+    candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+    used_left, used_right = set(), set()
+    proposals = []
+    for score, i, j in candidates:
+        if i in used_left or j in used_right:
+            continue
+        used_left.add(i)
+        used_right.add(j)
+        proposals.append({'col1': left_cols[i], 'col2': right_cols[j], 'score': round(score, 3)})
+    return proposals
+
+
+def _sample_key(value) -> str:
+    """抽样取值的比较形式：与对比时一致地去空白、统一数字格式。"""
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (int, float)):
+        return f"{value:.15g}"
+    text = str(value).strip()
+    try:
+        return f"{float(text.replace(',', '')):.15g}"
+    except ValueError:
+        return text
+
+
+def sample_column_values(file_path: str, columns, max_rows: int = 200):
+    """用 openpyxl 只读模式读取前 max_rows 行，返回 {列名: 取值集合}；不加载 pandas。"""
+    wanted = set(columns)
+    samples = {c: set() for c in wanted}
+    try:
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(min_row=1, max_row=max_rows + 1, values_only=True)
+            header = next(rows, ())
+            positions = [(k, str(h).strip()) for k, h in enumerate(header)
+                         if h is not None and str(h).strip() in wanted]
+            for row in rows:
+                for k, name in positions:
+                    if k < len(row) and row[k] is not None and str(row[k]).strip():
+                        samples[name].add(_sample_key(row[k]))
+        finally:
+            wb.close()
+    except Exception:
+        pass
+    return samples
+
+
+def value_overlap(values1, values2):
+    """两组抽样取值的重叠率（交集 / 较小集合），任一侧无样本时返回 None。"""
+    if not values1 or not values2:
+        return None
+    return len(values1 & values2) / min(len(values1), len(values2))
+
+
+# 索引列推荐：用 openpyxl 流式读取逐列统计，内存有界（精确去重有总预算，超出后结论为“未能确认”）
+class _KMVSketch:
+    """K 最小值（KMV）基数草图：保留 k 个最小哈希值，可估计去重数量及两列取值的重叠。"""
+
+    _SPACE = float(1 << 64)
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap = []  # 取负值的最大堆，堆顶为当前第 k 小的哈希
+        self._members = set()
+
+    def add(self, h: int):
+        if h in self._members:
+            return
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, -h)
+            self._members.add(h)
+        elif h < -self._heap[0]:
+            removed = -heapq.heapreplace(self._heap, -h)
+            self._members.discard(removed)
+            self._members.add(h)
+
+    def estimate(self) -> float:
+        if len(self._heap) < self.k:
+            return float(len(self._heap))
+        return (self.k - 1) * self._SPACE / (-self._heap[0] + 1)
+
+    def overlap(self, other: '_KMVSketch') -> float:
+        """估计交集占较小一侧去重数的比例（0~1）。"""
+        k = min(self.k, other.k)
+        union = heapq.nsmallest(k, self._members | other._members)
+        if not union:
+            return 0.0
+        both = sum(1 for h in union if h in self._members and h in other._members)
+        if len(union) < k:
+            union_est = float(len(union))
+        else:
+            union_est = (k - 1) * self._SPACE / (union[-1] + 1)
+        smaller = min(self.estimate(), other.estimate())
+        return min(1.0, both / len(union) * union_est / smaller) if smaller else 0.0
+
+
+def _key_identity(value):
+    """索引取值的身份，与 pandas 读取后按原值连接一致：整数与等值的浮点数相同，文本不做任何归一化
+    （“001”与“1”是不同的键）。_sample_key 的数值归一化只用于对比列的取值抽样。"""
+    if isinstance(value, bool):
+        return ('bool', value)
+    if isinstance(value, float) and value.is_integer():
+        return ('num', int(value))
+    if isinstance(value, int):
+        return ('num', value)
+    return (type(value).__name__, value)
+
+
+def scan_index_candidates(file_path: str, max_rows: int = 200_000, k: int = 512,
+                          exact_budget: int = 2_000_000, cancel=None):
+    """流式扫描工作表前 max_rows 行，返回各列作为索引的统计信息；cancel 被置位时返回 None。
+
+    每列用哈希集合精确判重，一旦出现重复即停止跟踪该列。所有列的哈希合计不超过 exact_budget 个，
+    由仍在判重的列平分（有列退出后其余列的额度随之增加）；超出额度的列不再判重，unique 记为 None
+    （未能确认），不会因估计误差被误判为无重复。KMV 草图只用于估计去重数量与两文件取值的重叠。
+    """
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, ()) or ()
+        states = {}
+        for pos, h in enumerate(header):
+            name = str(h).strip() if h is not None else ''
+            if name and name not in states:
+                states[name] = {'pos': pos, 'seen': set(), 'sketch': _KMVSketch(k),
+                                'non_null': 0, 'nulls': 0, 'unique': True, 'checked': 0,
+                                'fractional': False}
+        active = list(states.values())  # 未发现重复的列
+        tracking = len(active)  # 仍在精确判重的列
+        exact_limit = exact_budget // max(1, tracking)
+        scanned = 0
+        truncated = False
+        for row in rows:
+            if scanned >= max_rows:
+                truncated = True
+                break
+            if not any(v is not None for v in row):
+                continue
+            scanned += 1
+            if scanned % 2000 == 0:
+                if cancel is not None and cancel.is_set():
+                    return None
+                time.sleep(0)  # 让出 GIL，保持界面流畅
+            changed = False
+            for st in active:
+                pos = st['pos']
+                v = row[pos] if pos < len(row) else None
+                if v is None or (isinstance(v, str) and not v.strip()):
+                    st['nulls'] += 1
+                    continue
+                st['non_null'] += 1
+                h = hash(_key_identity(v)) & 0xFFFFFFFFFFFFFFFF
+                st['sketch'].add(h)
+                seen = st['seen']
+                if seen is None:
+                    continue
+                if isinstance(v, float) and not v.is_integer():
+                    # 含小数的列不会被推荐为索引：停止判重，把额度让给其他列
+                    st['fractional'] = True
+                    st['unique'] = None
+                    st['seen'] = None
+                    changed = True
+                    continue
+                if h in seen:
+                    # 确定存在重复：不再适合作为索引，释放内存并停止跟踪
+                    st['unique'] = False
+                    st['seen'] = None
+                    changed = True
+                    continue
+                if len(seen) >= exact_limit:
+                    # 额度用尽：无法再精确判重，如实记为未能确认
+                    st['unique'] = None
+                    st['seen'] = None
+                    changed = True
+                    continue
+                seen.add(h)
+                st['checked'] += 1
+            if changed:
+                active = [st for st in active if st['unique'] is not False]
+                tracking = sum(1 for st in active if st['seen'] is not None)
+                exact_limit = exact_budget // max(1, tracking)
+    finally:
+        wb.close()
+
+    columns = {}
+    for name, st in states.items():
+        columns[name] = {
+            'unique': st['unique'],  # True 无重复 / False 有重复 / None 未能确认
+            'checked': st['checked'],
+            'non_null': st['non_null'],
+            'nulls': st['nulls'],
+            'fractional': st['fractional'],
+            'sketch': st['sketch'],
+        }
+    return {'rows': scanned, 'truncated': truncated, 'columns': columns}
+
+
+def recommend_index_pairs(profile1, profile2, limit: int = 3):
+    """根据两个文件的扫描结果推荐索引列对：两侧均确认无重复且取值重叠高者优先，同名列略加权。
+    含小数的数值列（金额、比率等）即使恰好无重复也不适合作为索引，不予推荐。"""
+    def candidates(profile):
+        return [(name, p) for name, p in profile['columns'].items()
+                if p['unique'] is True and p['non_null'] > 0 and not p['fractional']]
+
+    scored = []
+    for name1, p1 in candidates(profile1):
+        for name2, p2 in candidates(profile2):
+            overlap = p1['sketch'].overlap(p2['sketch'])
+            if overlap <= 0:
+                continue
+            score = overlap
+            if normalize_header(name1) == normalize_header(name2):
+                score += 0.1
+            if p1['nulls'] or p2['nulls']:
+                score -= 0.2
+            scored.append((score, overlap, name1, name2))
+    scored.sort(key=lambda s: -s[0])
+    used1, used2 = set(), set()
+    result = []
+    for score, overlap, name1, name2 in scored:
+        if name1 in used1 or name2 in used2:
+            continue
+        used1.add(name1)
+        used2.add(name2)
+        result.append({'col1': name1, 'col2': name2, 'overlap': round(overlap, 3)})
+        if len(result) >= limit:
+            break
+    return result
+
+
+# 类型感知的归一化：每个映射列先判定一次类型，再按类型向量化转换为可直接比较的数值，
+# 解析失败的个别取值退回上面的字符串归一化逐行比较。
+_DATE_TEXT_RE = re.compile(
+    r"^\d{4}(?:[-/.]\d{1,2}[-/.]\d{1,2}|年\d{1,2}月\d{1,2}日?)"
+    r"(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$"
+)
+# “/”与年月日只会出现在日期部分，一次 translate 改为 ISO 分隔符
+_DATE_SEP_TABLE = str.maketrans({'/': '-', '年': '-', '月': '-', '日': None})
+# 2024.1.5 形式的日期分隔符（小数秒中的“.”不能一并替换）
+_DATE_DOT_RE = re.compile(r"^(\d{4})\.(\d{1,2})\.")
+_BOOL_WORDS = {
+    'true': True, 'false': False, 't': True, 'f': False,
+    'yes': True, 'no': False, 'y': True, 'n': False,
+    '1': True, '0': False,
+    '是': True, '否': False,
+}
+# 类型组合 -> 按哪种类型比较；未列出的组合按文本比较
+_PAIR_KINDS = {
+    frozenset(['datetime', 'text']): 'datetime',
+    frozenset(['boolean', 'text']): 'boolean',
+    frozenset(['boolean', 'numeric']): 'boolean',
+}
+
+
+def detect_column_kind(s: 'pd.Series', sample_size: int = 1000) -> str:
+    """判定列类型：numeric / datetime / boolean / text。object 列抽样检查取值，全部可解析才认定为该类型。"""
+    api = pd.api.types
+    if api.is_bool_dtype(s):
+        return 'boolean'
+    if api.is_numeric_dtype(s):
+        return 'numeric'
+    if api.is_datetime64_any_dtype(s):
+        return 'datetime'
+    values = s.dropna()
+    if len(values) > sample_size:
+        values = values.sample(sample_size, random_state=0)
+    if values.empty:
+        return 'text'
+    types = set(values.map(type))
+    if types <= {bool}:
+        return 'boolean'
+    # datetime / pd.Timestamp 均为 date 的子类
+    has_dates = any(issubclass(t, date) for t in types)
+    if has_dates and all(issubclass(t, date) for t in types):
+        return 'datetime'
+    texts = values.astype(str).str.strip()
+    texts = texts[texts != '']
+    if texts.empty:
+        return 'text'
+    if not has_dates:
+        if pd.to_numeric(texts.str.replace(',', '', regex=False), errors='coerce').notna().all():
+            return 'numeric'
+        if texts.str.lower().isin(list(_BOOL_WORDS)).all():
+            return 'boolean'
+    # 日期对象转成的字符串（如 2024-01-05 00:00:00）同样匹配
+    if texts.str.match(_DATE_TEXT_RE).all():
+        return 'datetime'
+    return 'text'
+
+
+def _parse_date_text(text: 'pd.Series'):
+    """按 _DATE_TEXT_RE 接受的写法（年-月-日顺序，可带时间）解析文本日期，返回 datetime64[ms] 数组。
+
+    不做格式推断：只有完整匹配 _DATE_TEXT_RE 的文本改写为 ISO 后按 ISO 8601 解析；
+    06/01/2024 这类月日顺序有歧义的写法与其他无法识别的文本均为 NaT，交给字符串比较。
+    """
+    import numpy as np
+    text = text.astype(str).str.strip()
+    values = np.full(len(text), np.datetime64('NaT', 'ms'))
+    valid = text.str.match(_DATE_TEXT_RE).to_numpy(dtype=bool)
+    if not valid.any():
+        return values
+    # 改写为 ISO 的 2024-1-5；含“.”的少数行再按正则只改日期部分
+    iso = text[valid].str.translate(_DATE_SEP_TABLE)
+    dotted = iso.str.contains('.', regex=False).to_numpy(dtype=bool)
+    if dotted.any():
+        iso[dotted] = iso[dotted].str.replace(_DATE_DOT_RE, r'\1-\2-', regex=True)
+    values[valid] = pd.to_datetime(iso, errors='coerce', format='ISO8601').to_numpy(dtype='datetime64[ms]')
+    return values
+
+
+def _blank_mask(s: 'pd.Series') -> 'pd.Series':
+    """缺失值及空白字符串（按类型比较时视为缺失）。"""
+    mask = s.isna()
+    if s.dtype == object:
+        mask |= s.map(lambda v: isinstance(v, str) and not v.strip())
+    return mask
+
+
+def _canonical_values(s: 'pd.Series', kind: str):
+    """按类型转换为可比较的数值，返回 (values, missing, parsed)，均为与 s 等长的 numpy 数组。
+
+    numeric -> float64；datetime -> 毫秒时间戳 int64（Excel 时间精度约为毫秒）；boolean -> 1.0 / 0.0。
+    parsed 为 False 的位置是非空但无法按该类型解析的取值。
+    """
+    import numpy as np
+    missing = _blank_mask(s).to_numpy()
+    if kind == 'numeric':
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            values = s.to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            values = pd.to_numeric(s.astype(str).str.strip().str.replace(',', '', regex=False), errors='coerce')
+            values = values.to_numpy(dtype='float64', na_value=np.nan)
+        parsed = missing | ~np.isnan(values)
+        return values, missing, parsed
+    if kind == 'datetime':
+        if pd.api.types.is_datetime64_any_dtype(s):
+            if s.dt.tz is not None:
+                s = s.dt.tz_localize(None)
+            values = s.to_numpy(dtype='datetime64[ms]')
+        else:
+            # object 列：日期对象直接转换（带时区的按其本地时间），文本只接受固定写法，其余为 NaT
+            values = np.full(len(s), np.datetime64('NaT', 'ms'))
+            if pd.api.types.infer_dtype(s, skipna=True) == 'string':
+                # 常见情况：整列都是文本，省去逐个判断类型
+                is_text = ~missing
+                is_date = np.zeros(len(s), dtype=bool)
+            else:
+                kinds = s.map(lambda v: 1 if isinstance(v, str) else 2 if isinstance(v, date) else 0).to_numpy()
+                is_text, is_date = kinds == 1, kinds == 2
+            if is_date.any():
+                objs = s[is_date].map(lambda v: v.replace(tzinfo=None) if isinstance(v, datetime) else v)
+                values[is_date] = pd.to_datetime(objs, errors='coerce').to_numpy(dtype='datetime64[ms]')
+            if is_text.any():
+                values[is_text] = _parse_date_text(s[is_text])
+        nat = np.isnat(values)
+        ms = values.astype('int64')
+        ms = np.where(nat, 0, ms)
+        return ms, missing, missing | ~nat
+    # boolean
+    def _to_bool(v):
+        if isinstance(v, (bool, np.bool_)):
+            return 1.0 if v else 0.0
+        if isinstance(v, (int, float, np.integer, np.floating)) and v in (0, 1):
+            return float(v)
+        if isinstance(v, str):
+            b = _BOOL_WORDS.get(v.strip().lower())
+            return np.nan if b is None else float(b)
+        return np.nan
+    if pd.api.types.is_bool_dtype(s):
+        values = s.to_numpy(dtype='float64', na_value=np.nan)
+    else:
+        values = s.map(_to_bool).to_numpy(dtype='float64')
+    return values, missing, missing | ~np.isnan(values)
+
+
+def pair_mismatch(s1: 'pd.Series', s2: 'pd.Series', kind1: str, kind2: str) -> 'pd.Series':
+    """按两列的类型比较已对齐的两列，返回差异掩码（True 表示不一致）。
+
+    同为日期（含文本日期）时按时间点比较，两侧都没有时间部分时按 epoch 天比较；数值按 15 位有效数字
+    的相对误差比较；布尔值统一为 True/False；其余情况与解析失败的个别取值按字符串归一化比较。
+    """
+    import numpy as np
+    kind = kind1 if kind1 == kind2 else _PAIR_KINDS.get(frozenset([kind1, kind2]), 'text')
+    if kind == 'text':
+        return _normalize_series(s1) != _normalize_series(s2)
+    v1, missing1, parsed1 = _canonical_values(s1, kind)
+    v2, missing2, parsed2 = _canonical_values(s2, kind)
+    if kind == 'numeric':
+        with np.errstate(invalid='ignore'):
+            equal = np.abs(v1 - v2) <= 1e-14 * np.maximum(np.abs(v1), np.abs(v2))
+    else:
+        if kind == 'datetime':
+            day_ms = 86_400_000
+            if not (v1[~missing1] % day_ms).any() and not (v2[~missing2] % day_ms).any():
+                v1, v2 = v1 // day_ms, v2 // day_ms
+        equal = v1 == v2
+    both_missing = missing1 & missing2
+    one_missing = missing1 ^ missing2
+    mismatch = ~(equal | both_missing) | one_missing
+    fallback = ~(parsed1 & parsed2)
+    if fallback.any():
+        mismatch[fallback] = (_normalize_series(s1[fallback]).to_numpy()
+                              != _normalize_series(s2[fallback]).to_numpy())
+    return pd.Series(mismatch, index=s1.index)
+
+
+def _as_key_list(index):
+    """索引参数统一为列名列表：单列可直接传字符串，组合索引传列表（按顺序一一对应）。"""
+    if index is None:
+        return []
+    if isinstance(index, str):
+        return [index.strip()] if index.strip() else []
+    return [str(c).strip() for c in index if str(c).strip()]
+
+
+def _check_index_columns(df1, df2, keys1, keys2):
+    if (not keys1 or not keys2
+            or any(k not in df1.columns for k in keys1) or any(k not in df2.columns for k in keys2)):
+        raise CompareError("找不到指定的索引列，请检查列名是否正确")
+    if len(keys1) != len(keys2):
+        raise CompareError("两个文件的索引列数量不一致，请按相同顺序选择组合索引列")
+
+
+def build_join_keys(df1, df2, keys1, keys2):
+    """把（组合）索引编码为 int64 键，返回 (codes1, codes2)。
+
+    逐列对两表的取值一起 factorize 得到整数编码，再按混合进制合并为单个 int64，
+    两表共用同一套编码：键相等当且仅当各索引列取值都相等。避免构造对象元组的 MultiIndex，
+    多列索引的连接与单列一样走整数哈希。缺失值视为一个普通取值。
+    """
+    n1 = len(df1)
+    combined = None
+    cardinality = 1
+    for col1, col2 in zip(keys1, keys2):
+        values = pd.concat([df1[col1], df2[col2]], ignore_index=True)
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        codes = codes.astype('int64', copy=False)
+        size = max(len(uniques), 1)
+        if combined is None:
+            combined, cardinality = codes, size
+            continue
+        if cardinality * size >= 2 ** 63:
+            # 组合空间将溢出 int64：先把已合并的键重新压缩为稠密编码
+            combined, uniques = pd.factorize(combined)
+            combined = combined.astype('int64', copy=False)
+            cardinality = max(len(uniques), 1)
+        combined = combined * size + codes
+        cardinality *= size
+    return combined[:n1], combined[n1:]
+
+
+def _first_by_key(df, codes, keys):
+    """按 int64 键去重（保留首行）并以键为索引，返回 (去掉索引列的数据, 索引列取值)。"""
+    first = ~pd.Index(codes).duplicated(keep='first')
+    key_index = pd.Index(codes[first], name='_key')
+    data = df[first].drop(columns=keys).set_axis(key_index)
+    labels = df.loc[first, keys].set_axis(key_index)
+    return data, labels
+
+
+def _key_labels(labels, keys, key_values):
+    """int64 键转回报表中的索引：单列为普通 Index，多列为以各索引列命名的 MultiIndex。"""
+    sub = labels.loc[key_values]
+    if len(keys) == 1:
+        return pd.Index(sub[keys[0]].to_numpy(), name=keys[0])
+    return pd.MultiIndex.from_frame(sub)
+
+
+def find_duplicates(df1, df2, index1, index2, file1_name: str, file2_name: str):
+    """返回两个表中索引（可为组合索引）重复的全部行，并以“来源”列标明所属文件。"""
+    keys1, keys2 = _as_key_list(index1), _as_key_list(index2)
+    _check_index_columns(df1, df2, keys1, keys2)
+    # assign 返回新表，不修改调用方（缓存）的数据；空表上也能正常添加列
+    duplicates_df1 = df1[df1.duplicated(keys1, keep=False)].assign(**{'来源': file1_name})
+    duplicates_df2 = df2[df2.duplicated(keys2, keep=False)].assign(**{'来源': file2_name})
+    return pd.concat([duplicates_df1, duplicates_df2])
+
+
+def key_only_rows(df1, df2, index1, index2, file1_name: str, file2_name: str):
+    """返回只存在于其中一个表的索引行（重复索引取首行），以“来源”列标明所属文件。"""
+    keys1, keys2 = _as_key_list(index1), _as_key_list(index2)
+    _check_index_columns(df1, df2, keys1, keys2)
+    codes1, codes2 = build_join_keys(df1, df2, keys1, keys2)
+    first1 = ~pd.Index(codes1).duplicated(keep='first')
+    first2 = ~pd.Index(codes2).duplicated(keep='first')
+    only1 = df1[first1 & ~pd.Index(codes1).isin(codes2)].assign(**{'来源': file1_name})
+    only2 = df2[first2 & ~pd.Index(codes2).isin(codes1)].assign(**{'来源': file2_name})
+    return pd.concat([only1, only2], ignore_index=True)
+
+
+def compare_frames(df1, df2, index1, index2, mappings, file1_name: str, file2_name: str, on_result=None):
+    """按索引对齐两个表并逐对比较映射列。
+
+    index1/index2 为索引列名，组合索引传列名列表（两侧按顺序一一对应）；
+    mappings 为 [{'col1', 'col2'}, ...]；返回 (summary_df, detailed_df)，无差异时返回 (None, None)。
+    on_result(name, df) 在 'detailed' / 'summary' 各自算好后立即回调，便于调用方提前开始写出。
+    不修改传入的 DataFrame，可直接使用缓存的数据。
+    两个文件名相同（如另一目录下重新生成的同名工作簿）时，结果列名分别加上“(1)”“(2)”以免重名。
+    """
+    keys1, keys2 = _as_key_list(index1), _as_key_list(index2)
+    _check_index_columns(df1, df2, keys1, keys2)
+    if file1_name == file2_name:
+        file1_name, file2_name = f"{file1_name}(1)", f"{file2_name}(2)"
+    codes1, codes2 = build_join_keys(df1, df2, keys1, keys2)
+    df1, labels1 = _first_by_key(df1, codes1, keys1)
+    df2, _ = _first_by_key(df2, codes2, keys2)
+
+    common_index = df1.index.intersection(df2.index)
+    df1_common = df1.loc[common_index]
+    df2_common = df2.loc[common_index]
+
+    # 过滤无效列
+    column_mappings = []
+    for m in mappings or []:
+        col1 = str(m.get('col1', '')).strip()
+        col2 = str(m.get('col2', '')).strip()
+        if col1 and col2 and col1 in df1_common.columns and col2 in df2_common.columns:
+            column_mappings.append({'col1': col1, 'col2': col2})
+
+    if not column_mappings:
+        raise CompareError("没有有效的列进行对比。请检查您是否已填写对比列，以及列名是否正确。", kind='warning')
+
+    # 每个映射列只判定一次类型；每一对列只比较一次，同时得到逐列差异掩码与总体差异掩码
+    column_kinds = {}
+
+    def kind_of(side, frame, col):
+        if (side, col) not in column_kinds:
+            column_kinds[(side, col)] = detect_column_kind(frame[col])
+        return column_kinds[(side, col)]
+
+    pair_masks = []
+    overall_mismatch_mask = pd.Series(False, index=df1_common.index)
+    for mapping in column_mappings:
+        col1, col2 = mapping['col1'], mapping['col2']
+        pair_mask = pair_mismatch(df1_common[col1], df2_common[col2],
+                                  kind_of(1, df1_common, col1), kind_of(2, df2_common, col2))
+        pair_masks.append(pair_mask)
+        overall_mismatch_mask |= pair_mask
+
+    mismatch_indices = df1_common.index[overall_mismatch_mask]
+    if mismatch_indices.empty:
+        return None, None
+
+    # 仅保留存在差异的列与行，避免把相同数据一并导出
+    detail_masks = {}  # (侧, 列名) -> 差异行掩码；同一列映射到多列时合并为一列
+    summary_parts = []
+    # 差异行在公共索引中的位置，用于让汇总表保持“按行、再按映射顺序”的排列
+    positions = pd.Series(range(len(df1_common.index)), index=df1_common.index)
+    for order, (mapping, pair_mask) in enumerate(zip(column_mappings, pair_masks)):
+        col1, col2 = mapping['col1'], mapping['col2']
+        pair_indices = df1_common.index[pair_mask]
+        if pair_indices.empty:
+            continue
+
+        for key in ((1, col1), (2, col2)):
+            detail_masks[key] = detail_masks[key] | pair_mask if key in detail_masks else pair_mask
+
+        summary_part = {'_pos': positions[pair_mask].to_numpy(), '_order': order}
+        pair_labels = labels1.loc[pair_indices]
+        for key in keys1:
+            summary_part[key] = pair_labels[key].to_numpy()
+        summary_parts.append(pd.DataFrame({
+            **summary_part,
+            '不一致的列': f"{col1} vs {col2}",
+            f'{file1_name}的值': df1_common.loc[pair_indices, col1].to_numpy(),
+            f'{file2_name}的值': df2_common.loc[pair_indices, col2].to_numpy(),
+        }))
+
+    # 详细对比的列名保持唯一（Parquet 等格式不允许重名），仍重名时追加序号
+    detailed_result_list = []
+    used_names = set()
+    for (side, col), mask in detail_masks.items():
+        frame, file_name = (df1_common, file1_name) if side == 1 else (df2_common, file2_name)
+        name, n = f"{file_name}_{col}", 1
+        while name in used_names:
+            n += 1
+            name = f"{file_name}_{col}_{n}"
+        used_names.add(name)
+        detailed_result_list.append(frame.loc[mask, col].rename(name))
+
+    # 按索引对齐横向拼接，再把 int64 键换回索引列取值
+    detailed_df = pd.concat(detailed_result_list, axis=1)
+    detailed_df.index = _key_labels(labels1, keys1, detailed_df.index)
+    if on_result is not None:
+        on_result('detailed', detailed_df)
+    # 各对比列的取值类型可能不同（某列差异行可能全为空值），类型不一致的值列统一为 object 再拼接，
+    # 汇总表的列类型不依赖 pandas 对全空列的推断规则
+    for col in (f'{file1_name}的值', f'{file2_name}的值'):
+        if len({part[col].dtype for part in summary_parts}) > 1:
+            for part in summary_parts:
+                part[col] = part[col].astype(object)
+    summary_df = (
+        pd.concat(summary_parts, ignore_index=True)
+        .sort_values(['_pos', '_order'], kind='stable')
+        .drop(columns=['_pos', '_order'])
+        .reset_index(drop=True)
+    )
+    if on_result is not None:
+        on_result('summary', summary_df)
+    return summary_df, detailed_df
+
+
+# 机器可读的结果输出：CSV / Parquet / JSON Lines，下游无需 Excel 解析器。
+# 结果表在内存中完整算出后才写出，分块只决定写出粒度（Parquet 的 row group 大小），并不降低内存占用。
+OUTPUT_FORMATS = [
+    ('xlsx', 'Excel (.xlsx)'),
+    ('csv', 'CSV (.csv)'),
+    ('parquet', 'Parquet (.parquet)'),
+    ('jsonl', 'JSON Lines (.jsonl)'),
+]
+
+
+class _CsvSink:
+    """CSV（UTF-8），首块写表头。"""
+
+    def __init__(self, path: str):
+        self._f = open(path, 'w', encoding='utf-8', newline='')
+        self._header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self._f, index=False, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._f.close()
+
+
+class _JsonLinesSink:
+    """每行一条 JSON 记录，日期为 ISO 格式。"""
+
+    def __init__(self, path: str):
+        self._f = open(path, 'w', encoding='utf-8')
+
+    def write(self, chunk):
+        if len(chunk):
+            chunk.to_json(self._f, orient='records', lines=True, force_ascii=False, date_format='iso')
+
+    def close(self):
+        self._f.close()
+
+
+class _ParquetSink:
+    """逐块写入同一个 Parquet 文件（每块一个 row group），需要 pyarrow。"""
+
+    def __init__(self, path: str):
+        import pyarrow
+        import pyarrow.parquet
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._path = path
+        self._writer = None
+
+    def write(self, chunk):
+        if not chunk.columns.is_unique:
+            dup = sorted({str(c) for c in chunk.columns[chunk.columns.duplicated()]})
+            raise CompareError(f"Parquet 不支持重复的列名：{', '.join(dup)}")
+        # 汇总表的“值”列混合了各对比列的取值，object 列统一转为字符串以得到稳定的列类型
+        obj_cols = [c for c in chunk.columns if chunk[c].dtype == object]
+        if obj_cols:
+            chunk = chunk.assign(**{c: chunk[c].astype('string') for c in obj_cols})
+        table = self._pa.Table.from_pandas(chunk, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+_RESULT_SINKS = {'csv': _CsvSink, 'jsonl': _JsonLinesSink, 'parquet': _ParquetSink}
+
+
+def check_output_format(fmt: str):
+    """确认输出格式可用；Parquet 依赖可选的 pyarrow，缺失时提前给出提示。"""
+    if fmt != 'xlsx' and fmt not in _RESULT_SINKS:
+        raise CompareError(f"不支持的输出格式：{fmt}")
+    if fmt == 'parquet':
+        try:
+            importlib.import_module('pyarrow.parquet')
+        except ImportError:
+            raise CompareError("输出 Parquet 需要安装 pyarrow：pip install pyarrow")
+
+
+def write_result_frame(df, filename: str, fmt: str, chunk_rows: int = 100_000):
+    """把已完整算出的结果表按 chunk_rows 行一块写出为 CSV / Parquet / JSON Lines；
+    Parquet 每块对应一个 row group，CSV / JSON Lines 逐块追加，结果与一次写出相同。"""
+    sink = _RESULT_SINKS[fmt](filename)
+    try:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            sink.write(df.iloc[start:start + chunk_rows])
+    finally:
+        sink.close()
+
+
+def write_frame_file(path: str, df, fmt: str):
+    """把一个结果表写出到 path：xlsx 为单个工作表，其余格式见 write_result_frame。"""
+    if fmt == 'xlsx':
+        df.to_excel(path, index=False, engine='openpyxl')
+    else:
+        write_result_frame(df, path, fmt)
+
+
+def write_report_workbook(path: str, summary_df, detailed_df):
+    """写出 Excel 对比报表（差异汇总 + 详细对比数据）。"""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        summary_df.to_excel(writer, sheet_name='差异汇总', index=False)
+        # 组合索引展开为多列，不合并单元格，便于筛选与再处理
+        detailed_df.to_excel(writer, sheet_name='详细对比数据', index=True, merge_cells=False)
+
+
+def _write_atomically(filename: str, write, args):
+    """先写入同目录的临时文件（保留扩展名，便于写出引擎识别格式），成功后原子重命名为 filename。"""
+    root, ext = os.path.splitext(filename)
+    tmp_path = f"{root}.part{ext}"
+    try:
+        write(tmp_path, *args)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return filename
+
+
+def _init_writer_process():
+    # 写出子进程不经过界面的后台预热，启动时直接导入 pandas
+    wait_for_pandas()
+
+
+_writer_processes = None
+_writer_processes_lock = threading.Lock()
+
+
+def _submit_to_writer_process(fn, *args):
+    """提交到写出子进程池；池在首次使用时创建并跨多次对比复用，子进程异常退出后重建。"""
+    global _writer_processes
+    with _writer_processes_lock:
+        for _ in range(2):
+            if _writer_processes is None:
+                # spawn：界面进程中有 Qt 与预热等线程，fork 出的子进程可能继承被占用的锁
+                _writer_processes = ProcessPoolExecutor(
+                    max_workers=min(2, os.cpu_count() or 1), mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_writer_process)
+            try:
+                return _writer_processes.submit(fn, *args)
+            except BrokenProcessPool:
+                _writer_processes = None
+        raise BrokenProcessPool("无法启动结果写出进程")
+
+
+class BackgroundWriter:
+    """在后台写出结果文件，与后续的去重、对比计算并行进行。
+
+    写出（openpyxl 序列化等）是纯 Python 的 CPU 计算，在线程中会与对比计算争抢 GIL，
+    因此行数达到 process_min_rows 的结果表交给写出子进程，真正与对比并行；小表进程间传输不划算，
+    在后台线程写出。每个任务先写临时文件再原子重命名，不会留下写了一半的结果；
+    任务中的异常在 wait() 时抛回调用方。
+    """
+
+    process_min_rows = 20_000
+
+    def __init__(self):
+        self._threads = ThreadPoolExecutor(max_workers=1, thread_name_prefix='result-writer')
+        self._futures = []
+
+    def submit(self, filename: str, write, *args, rows: int = 0):
+        """提交写出任务：write(临时路径, *args) 负责写入内容。交给子进程时 write 须为模块级函数，
+        args 须可 pickle。"""
+        if rows >= self.process_min_rows:
+            future = _submit_to_writer_process(_write_atomically, filename, write, args)
+        else:
+            future = self._threads.submit(_write_atomically, filename, write, args)
+        self._futures.append(future)
+
+    def _wait_all(self, poll, interval: float):
+        pending = set(self._futures)
+        while pending:
+            _, pending = futures_wait(pending, timeout=interval)
+            if pending and poll is not None:
+                poll()
+
+    def wait(self, poll=None, interval: float = 0.05):
+        """等待全部任务完成（期间周期调用 poll 保持界面响应），按提交顺序返回文件名；
+        任一任务失败时抛出其异常，其余任务仍会执行完毕。"""
+        try:
+            self._wait_all(poll, interval)
+            return [f.result() for f in self._futures]
+        finally:
+            self._threads.shutdown(wait=True)
+
+    def close(self, poll=None, interval: float = 0.05):
+        """对比已出错时使用：已提交的任务（如重复索引文件）照常写完，异常被忽略。"""
+        try:
+            self._wait_all(poll, interval)
+        finally:
+            self._threads.shutdown(wait=True)
+
+
+# ---------------------------------------------------------------------------
+# 本地对比服务：--serve 启动，仅监听本机（localhost 端口或 Unix socket），
+# 常用的参照表解析后常驻内存，重复对比无需再次解析 Excel。
+# ---------------------------------------------------------------------------
+
+class FrameCache:
+    """已解析工作表的 LRU 缓存，按内存占用上限淘汰，按文件修改时间与大小失效。线程安全。"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> (签名, DataFrame, 字节数)
+        self._lock = threading.Lock()
+        self._loading = {}  # path -> Lock，同一文件并发请求只解析一次
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _signature(path: str):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, path: str):
+        """返回 path 对应的 DataFrame；调用方不得原地修改返回的数据。"""
+        path = os.path.abspath(path)
+        signature = self._signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            load_lock = self._loading.setdefault(path, threading.Lock())
+        with load_lock:
+            # 等待期间可能已由其他请求加载完成
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is not None and entry[0] == signature:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+            try:
+                try:
+                    df = pd.read_excel(path, header=0, engine='openpyxl')
+                except Exception as e:
+                    # 不是有效的 Excel 文件（非 zip、格式损坏等）属于请求参数问题
+                    raise CompareError(f"无法读取 Excel 文件：{path}（{e}）") from e
+                nbytes = int(df.memory_usage(index=True, deep=True).sum())
+                with self._lock:
+                    self._entries[path] = (signature, df, nbytes)
+                    self._entries.move_to_end(path)
+                    self._evict()
+            finally:
+                with self._lock:
+                    self._loading.pop(path, None)
+            return df
+
+    def _evict(self):
+        # 至少保留最近使用的一项，单个超大表也能完成本次请求
+        total = sum(e[2] for e in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, nbytes) = self._entries.popitem(last=False)
+            total -= nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(e[2] for e in self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def _frame_records(df, index: bool = False):
+    """DataFrame 转为 JSON 友好的记录列表（日期为 ISO 格式，缺失值为 null）。"""
+    if df is None:
+        return []
+    if index:
+        df = df.reset_index()
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+class CompareRequestHandler(BaseHTTPRequestHandler):
+    """JSON 接口（均为 POST，请求体为 JSON 对象）：
+
+    /headers  {"path"}                                         -> 列名
+    /compare  {"file1", "file2", "index1", "index2", "mappings"} -> 差异汇总、详细对比、重复索引
+    /keys     {"file1", "file2", "index1", "index2"}             -> 仅存在于一侧的索引行
+    GET /health 返回缓存状态。
+    index1/index2 可为列名或列名列表（组合索引，两侧按顺序一一对应）。
+    """
+
+    server_version = 'ExcelCompare'
+    # 每个请求后关闭连接：长连接会一直占用线程池中的工作线程
+    protocol_version = 'HTTP/1.0'
+    # 连接后迟迟不发送请求的客户端在超时后释放工作线程
+    timeout = 10
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            sys.stderr.write(f"[serve] {format % args}\n")
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._send_json(200, {'status': 'ok', 'cache': self.server.cache.stats()})
+        else:
+            self._send_json(404, {'error': f"未知接口：{self.path}"})
+
+    def do_POST(self):
+        routes = {
+            '/headers': self._handle_headers,
+            '/compare': self._handle_compare,
+            '/keys': self._handle_keys,
+        }
+        handler = routes.get(self.path.rstrip('/'))
+        if handler is None:
+            self._send_json(404, {'error': f"未知接口：{self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            params = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(params, dict):
+                raise CompareError("请求体必须是 JSON 对象")
+            t0 = time.perf_counter()
+            payload = handler(params)
+            payload['elapsed'] = round(time.perf_counter() - t0, 4)
+            self._send_json(200, payload)
+        except CompareError as e:
+            self._send_json(400, {'error': str(e)})
+        except (FileNotFoundError, ValueError) as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': f"对比过程中发生错误: {e}"})
+
+    @staticmethod
+    def _require(params, *names):
+        missing = [n for n in names if not params.get(n)]
+        if missing:
+            raise CompareError(f"缺少参数：{', '.join(missing)}")
+        for n in names:
+            value = params[n]
+            if n.startswith('index'):
+                # 索引为列名或列名列表
+                ok = isinstance(value, str) or (isinstance(value, list) and all(isinstance(c, str) for c in value))
+            else:
+                ok = isinstance(value, str)
+            if not ok:
+                raise CompareError(f"参数 {n} 的类型不正确")
+        return [params[n] for n in names]
+
+    @staticmethod
+    def _mappings(params):
+        mappings = params.get('mappings')
+        if not isinstance(mappings, list) or not all(
+                isinstance(m, dict) and isinstance(m.get('col1'), str) and isinstance(m.get('col2'), str)
+                for m in mappings):
+            raise CompareError('参数 mappings 必须是 [{"col1": 列名, "col2": 列名}, ...] 形式的列表')
+        return mappings
+
+    def _display_names(self, params):
+        file1, file2 = params['file1'], params['file2']
+        name1 = params.get('file1_name') or os.path.splitext(os.path.basename(file1))[0]
+        name2 = params.get('file2_name') or os.path.splitext(os.path.basename(file2))[0]
+        return name1, name2
+
+    def _handle_headers(self, params):
+        (path,) = self._require(params, 'path')
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"文件不存在：{path}")
+        return {'columns': read_excel_header(path)}
+
+    def _handle_compare(self, params):
+        file1, file2, index1, index2 = self._require(params, 'file1', 'file2', 'index1', 'index2')
+        mappings = self._mappings(params)
+        name1, name2 = self._display_names(params)
+        df1 = self.server.cache.get(file1)
+        df2 = self.server.cache.get(file2)
+        duplicates = find_duplicates(df1, df2, index1, index2, name1, name2)
+        summary_df, detailed_df = compare_frames(df1, df2, index1, index2, mappings, name1, name2)
+        return {
+            'mismatch_rows': 0 if detailed_df is None else len(detailed_df),
+            'summary': _frame_records(summary_df),
+            'detailed': _frame_records(detailed_df, index=True),
+            'duplicates': _frame_records(duplicates),
+        }
+
+    def _handle_keys(self, params):
+        file1, file2, index1, index2 = self._require(params, 'file1', 'file2', 'index1', 'index2')
+        name1, name2 = self._display_names(params)
+        df1 = self.server.cache.get(file1)
+        df2 = self.server.cache.get(file2)
+        return {'key_only': _frame_records(key_only_rows(df1, df2, index1, index2, name1, name2))}
+
+
+class _WorkerPoolMixIn:
+    """用固定大小的线程池处理连接，限制并发解析/对比的数量。"""
+
+    def init_pool(self, workers: int, cache: FrameCache, verbose: bool):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='compare-worker')
+        self._open_requests = set()
+        self._requests_lock = threading.Lock()
+        self.cache = cache
+        self.verbose = verbose
+
+    def process_request(self, request, client_address):
+        with self._requests_lock:
+            self._open_requests.add(request)
+        self._pool.submit(self._process_request_in_pool, request, client_address)
+
+    def _process_request_in_pool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._requests_lock:
+                self._open_requests.discard(request)
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # 断开仍在等待的连接并丢弃排队的请求，停止服务时不必等客户端断开
+        with self._requests_lock:
+            pending = list(self._open_requests)
+        for request in pending:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class CompareHTTPServer(_WorkerPoolMixIn, HTTPServer):
+    pass
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class CompareUnixServer(_WorkerPoolMixIn, socketserver.UnixStreamServer):
+        def get_request(self):
+            # Unix socket 的客户端地址为空字符串，BaseHTTPRequestHandler 需要 (host, port)
+            request, _ = super().get_request()
+            return request, ('local', 0)
+
+
+def create_compare_server(port: int = 8765, socket_path: str = None,
+                          workers: int = 4, cache_mb: int = 1024, verbose: bool = False):
+    """创建（未启动的）本地对比服务；port 为 0 时由系统分配端口。
+
+    服务会读取请求中给出的任意路径且没有鉴权，因此只监听本机回环地址（127.0.0.1）或 Unix socket。
+    """
+    wait_for_pandas()
+    cache = FrameCache(cache_mb * 1024 * 1024)
+    if socket_path:
+        if not hasattr(socketserver, 'UnixStreamServer'):
+            raise OSError("当前系统不支持 Unix socket，请改用 --port")
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = CompareUnixServer(socket_path, CompareRequestHandler)
+    else:
+        server = CompareHTTPServer(('127.0.0.1', port), CompareRequestHandler)
+    server.init_pool(workers, cache, verbose)
+    return server
+
+
+def run_compare_service(argv):
+    parser = argparse.ArgumentParser(prog='excel_compare.py --serve', description="本地 Excel 对比服务（HTTP/JSON）")
+    parser.add_argument('--serve', action='store_true')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', dest='socket_path', help="改为监听 Unix socket 路径")
+    parser.add_argument('--workers', type=int, default=4, help="并发处理请求的线程数")
+    parser.add_argument('--cache-mb', type=int, default=1024, help="已解析工作表缓存的内存上限（MB）")
+    parser.add_argument('--verbose', action='store_true', help="输出访问日志")
+    args = parser.parse_args(argv)
+
+    server = create_compare_server(args.port, args.socket_path, args.workers, args.cache_mb, args.verbose)
+    where = args.socket_path or f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"对比服务已启动：{where}（Ctrl+C 停止）", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket_path and os.path.exists(args.socket_path):
+            os.unlink(args.socket_path)
 
 
 class FlowLayout(QtWidgets.QLayout):
@@ -84,6 +1386,11 @@ class FlowLayout(QtWidgets.QLayout):
             lineHeight = max(lineHeight, item.sizeHint().height())
         return y + lineHeight - rect.y()
 
+class _IndexScanSignals(QtCore.QObject):
+    """后台索引扫描线程通过信号把结果送回界面线程（generation, 结果或异常）。"""
+    finished = QtCore.pyqtSignal(int, object)
+
+
 class CompareToolApp(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
@@ -185,7 +1492,26 @@ class CompareToolApp(QtWidgets.QWidget):
         self.file2_display_name_str_full = "文件2"
         self.file1_display_name_str = "文件1"
         self.file2_display_name_str = "文件2"
-
+        # 已解析数据缓存：side -> (path, 文件签名, DataFrame)，文件未变化时复用
+        self._frame_cache = {}
+
+        # 监视模式：文件保存后防抖，再自动重新对比（仅重新解析发生变化的文件）
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_watched_file_changed)
+        self._watch_debounce = QtCore.QTimer(self)
+        self._watch_debounce.setSingleShot(True)
+        self._watch_debounce.setInterval(1000)
+        self._watch_debounce.timeout.connect(self._on_watch_debounced)
+        self._watch_rerun = False
+        self._compare_running = False
+
+        # 索引列推荐：选好两个文件后在后台流式扫描，结果按 generation 丢弃过期的扫描
+        self._index_profiles = None
+        self._index_recommendations = []
+        self._scan_generation = 0
+        self._scan_cancel = None
+        self._scan_signals = _IndexScanSignals(self)
+        self._scan_signals.finished.connect(self._on_index_scan_finished)
 
         # Main layout
         main_layout = QVBoxLayout()
@@ -228,6 +1554,17 @@ class CompareToolApp(QtWidgets.QWidget):
         files_grid.addWidget(self.file2_label, 1, 1)
         main_layout.addWidget(self.files_card)
 
+        # 组合索引：下拉为第一索引列，其余索引列按顺序追加（两侧数量与顺序需一致）
+        self.extra_keys = {1: [], 2: []}
+        self.extra_keys_containers = {}
+        self.extra_keys_layouts = {}
+        for side in (1, 2):
+            container = QWidget(); layout = FlowLayout(hspacing=6, vspacing=4)
+            container.setLayout(layout)
+            container.setVisible(False)
+            self.extra_keys_containers[side] = container
+            self.extra_keys_layouts[side] = layout
+
         # 索引设置卡片（下拉选择）
         self.index_card = QGroupBox("索引设置")
         index_section_layout = QFormLayout()
@@ -254,7 +1591,8 @@ class CompareToolApp(QtWidgets.QWidget):
             pass
         self.index1_combo.activated.connect(lambda _=None, c=self.index1_combo: self._on_combo_close(c))
         self.index1_combo.currentIndexChanged.connect(lambda _=None, c=self.index1_combo: self._on_combo_close(c))
-        index_section_layout.addRow(self.index1_label, self.index1_combo)
+        index_section_layout.addRow(self.index1_label, self._build_index_row(1, self.index1_combo))
+        index_section_layout.addRow("", self.extra_keys_containers[1])
         self.index2_label = QtWidgets.QLabel(f"{self.file2_display_name_str} 索引列：")
         self.index2_combo = QComboBox(); self.index2_combo.setEditable(True)
         self.index2_combo.lineEdit().setReadOnly(True)
@@ -273,7 +1611,24 @@ class CompareToolApp(QtWidgets.QWidget):
             pass
         self.index2_combo.activated.connect(lambda _=None, c=self.index2_combo: self._on_combo_close(c))
         self.index2_combo.currentIndexChanged.connect(lambda _=None, c=self.index2_combo: self._on_combo_close(c))
-        index_section_layout.addRow(self.index2_label, self.index2_combo)
+        index_section_layout.addRow(self.index2_label, self._build_index_row(2, self.index2_combo))
+        index_section_layout.addRow("", self.extra_keys_containers[2])
+        # 索引推荐提示：后台分析完成后显示推荐的索引列，并提示所选索引是否有重复
+        hint_row = QWidget()
+        hint_layout = QHBoxLayout(); hint_layout.setContentsMargins(0, 0, 0, 0); hint_layout.setSpacing(8)
+        hint_row.setLayout(hint_layout)
+        self.index_hint_label = QLabel("")
+        self.index_hint_label.setWordWrap(True)
+        self.index_hint_label.setStyleSheet("color: #5b6470; font-size: 14px;")
+        self.btn_apply_index = QPushButton("使用推荐")
+        self.btn_apply_index.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.btn_apply_index.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.btn_apply_index.setProperty('cssClass', 'ghost')
+        self.btn_apply_index.clicked.connect(self.apply_index_recommendation)
+        self.btn_apply_index.setVisible(False)
+        hint_layout.addWidget(self.index_hint_label, 1)
+        hint_layout.addWidget(self.btn_apply_index)
+        index_section_layout.addRow(hint_row)
         main_layout.addWidget(self.index_card)
 
         # 智能对比项设置卡片
@@ -324,10 +1679,17 @@ class CompareToolApp(QtWidgets.QWidget):
         self.btn_add_pair.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
         self.btn_add_pair.setFocusPolicy(QtCore.Qt.NoFocus)
         self.btn_add_pair.setProperty('cssClass', 'ghost')
-        self.btn_auto_pair = QPushButton("自动匹配同名列")
+        self.btn_auto_pair = QPushButton("自动匹配列名")
         self.btn_auto_pair.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
         self.btn_auto_pair.setFocusPolicy(QtCore.Qt.NoFocus)
         self.btn_auto_pair.setProperty('cssClass', 'ghost')
+        self.btn_auto_pair.setToolTip("同名列直接加入；相似列名作为建议，确认后加入")
+        # 自动匹配时抽样比对取值，剔除列名相似但取值毫无重叠的建议
+        self.sample_check = QCheckBox("抽样校验取值")
+        self.sample_check.setChecked(True)
+        self.sample_check.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.sample_check.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        actions_row.addWidget(self.sample_check)
         actions_row.addStretch(1)
         actions_row.addWidget(self.btn_auto_pair)
         actions_row.addWidget(self.btn_add_pair)
@@ -344,13 +1706,43 @@ class CompareToolApp(QtWidgets.QWidget):
         # 提升可视空间，默认可展示更多行标签
         self.tags_scroll.setMaximumHeight(200)
 
+        # 建议匹配区：模糊匹配得到的候选对，逐个确认或忽略（无建议时隐藏）
+        self.proposals_box = QWidget()
+        proposals_box_layout = QVBoxLayout(); proposals_box_layout.setContentsMargins(0, 0, 0, 0); proposals_box_layout.setSpacing(4)
+        self.proposals_box.setLayout(proposals_box_layout)
+        proposals_header = QHBoxLayout()
+        proposals_title = QLabel("建议匹配（✓ 加入对比项，✕ 忽略）：")
+        proposals_title.setStyleSheet("color: #5b6470; font-size: 14px;")
+        self.btn_accept_all = QPushButton("全部接受")
+        self.btn_accept_all.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.btn_accept_all.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.btn_accept_all.setProperty('cssClass', 'ghost')
+        self.btn_accept_all.clicked.connect(self.accept_all_proposals)
+        proposals_header.addWidget(proposals_title)
+        proposals_header.addStretch(1)
+        proposals_header.addWidget(self.btn_accept_all)
+        self.proposals_container = QWidget(); self.proposals_layout = FlowLayout(hspacing=8, vspacing=6)
+        self.proposals_layout.setContentsMargins(8, 4, 8, 4)
+        self.proposals_container.setLayout(self.proposals_layout)
+        self.proposals_scroll = QScrollArea(); self.proposals_scroll.setWidgetResizable(True)
+        self.proposals_scroll.setWidget(self.proposals_container)
+        self.proposals_scroll.setFrameShape(QtWidgets.QFrame.NoFrame)
+        self.proposals_scroll.setMaximumHeight(120)
+        proposals_box_layout.addLayout(proposals_header)
+        proposals_box_layout.addWidget(self.proposals_scroll)
+        self.proposals_box.setVisible(False)
+
         mapping_card_layout.addLayout(lists_row)
         mapping_card_layout.addLayout(actions_row)
+        mapping_card_layout.addWidget(self.proposals_box)
         mapping_card_layout.addWidget(self.tags_scroll)
         main_layout.addWidget(self.mapping_card)
 
         # 保存对比映射的数据结构
         self.mappings = []  # list of dicts {col1, col2}
+        # 模糊匹配建议与已忽略的建议（忽略后不再重复提出）
+        self.proposals = []  # list of dicts {col1, col2, score, overlap}
+        self._rejected_pairs = set()
 
         # 废弃旧的手工输入区域（保留结构以防后续扩展），现由标签配置替代
 
@@ -363,6 +1755,26 @@ class CompareToolApp(QtWidgets.QWidget):
         self.compare_button.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
         main_layout.addWidget(self.compare_button, alignment=QtCore.Qt.AlignCenter)
 
+        options_row = QHBoxLayout()
+        options_row.setSpacing(16)
+        # 输出格式：Excel 报表，或供下游程序读取的 CSV / Parquet / JSON Lines
+        self.format_combo = QComboBox()
+        for fmt, label in OUTPUT_FORMATS:
+            self.format_combo.addItem(label, fmt)
+        self.format_combo.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.format_combo.setToolTip("CSV / Parquet / JSON Lines 会分别输出差异汇总、详细对比、重复索引与仅一侧存在的索引")
+        # 监视模式开关：输入文件被重新保存后自动重新对比
+        self.watch_checkbox = QCheckBox("监视文件变化，自动重新对比")
+        self.watch_checkbox.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.watch_checkbox.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.watch_checkbox.toggled.connect(self.on_watch_toggled)
+        options_row.addStretch(1)
+        options_row.addWidget(QLabel("输出格式："))
+        options_row.addWidget(self.format_combo)
+        options_row.addWidget(self.watch_checkbox)
+        options_row.addStretch(1)
+        main_layout.addLayout(options_row)
+
         # Status label
         self.status_label = QtWidgets.QLabel("准备就绪")
         self.status_label.setAlignment(QtCore.Qt.AlignCenter)
@@ -392,6 +1804,8 @@ class CompareToolApp(QtWidgets.QWidget):
             self.file1_label.setToolTip(base_name)
             self.update_all_labels()
             self.refresh_column_lists()
+            self.update_watch_paths()
+            self.start_index_scan()
 
     def load_file2(self):
         options = QFileDialog.Options()
@@ -407,6 +1821,8 @@ class CompareToolApp(QtWidgets.QWidget):
             self.file2_label.setToolTip(base_name)
             self.update_all_labels()
             self.refresh_column_lists()
+            self.update_watch_paths()
+            self.start_index_scan()
             
     def _truncate_ui_name(self, text: str, max_len: int = 20) -> str:
         """将文本按字符长度中间截断，避免前端控件被拉伸。"""
@@ -419,6 +1835,76 @@ class CompareToolApp(QtWidgets.QWidget):
         right = keep - left
         return f"{text[:left]}...{text[-right:]}"
 
+    def _build_index_row(self, side: int, combo: QComboBox) -> QWidget:
+        """索引下拉 + “＋”按钮（追加组合索引列）。"""
+        row = QWidget()
+        h = QHBoxLayout(); h.setContentsMargins(0, 0, 0, 0); h.setSpacing(6)
+        row.setLayout(h)
+        btn = QPushButton("＋")
+        btn.setProperty('cssClass', 'ghost')
+        btn.setToolTip("追加索引列，组成组合索引（如 公司 + 科目 + 期间）")
+        btn.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        btn.setFocusPolicy(QtCore.Qt.NoFocus)
+        btn.clicked.connect(lambda _=None, sd=side, b=btn: self._show_extra_key_menu(sd, b))
+        h.addWidget(combo, 1)
+        h.addWidget(btn)
+        return row
+
+    def _selected_keys(self, side: int):
+        """当前选择的索引列（第一索引列 + 追加的组合索引列），未选第一索引列时为空。"""
+        combo = self.index1_combo if side == 1 else self.index2_combo
+        primary = combo.currentText().strip() if combo.count() else ''
+        if not primary:
+            return []
+        return [primary] + [c for c in self.extra_keys[side] if c != primary]
+
+    def _show_extra_key_menu(self, side: int, anchor: QWidget):
+        cols = getattr(self, 'cols1' if side == 1 else 'cols2', [])
+        keys = self._selected_keys(side)
+        if not keys:
+            QMessageBox.information(self, "提示", "请先选择第一索引列，再追加组合索引列。")
+            return
+        menu = QtWidgets.QMenu(self)
+        for c in cols:
+            if c not in keys:
+                menu.addAction(c)
+        if menu.isEmpty():
+            return
+        chosen = menu.exec_(anchor.mapToGlobal(QtCore.QPoint(0, anchor.height())))
+        if chosen is not None:
+            self.extra_keys[side].append(chosen.text())
+            self.refresh_column_lists()
+
+    def remove_extra_key(self, side: int, name: str):
+        if name in self.extra_keys[side]:
+            self.extra_keys[side].remove(name)
+            self.refresh_column_lists()
+
+    def render_extra_keys(self):
+        for side in (1, 2):
+            layout = self.extra_keys_layouts[side]
+            while layout.count():
+                it = layout.takeAt(0)
+                if it and it.widget():
+                    it.widget().deleteLater()
+            for name in self.extra_keys[side]:
+                chip = QWidget()
+                h = QHBoxLayout(); h.setContentsMargins(10, 3, 6, 3); h.setSpacing(4)
+                chip.setLayout(h)
+                chip.setStyleSheet("QWidget { border: 1px solid #e3e7ec; border-radius: 12px; background: #f6f8fb; }")
+                label = QLabel(f"+ {name}")
+                label.setStyleSheet("font-size: 14px;")
+                btn = QPushButton("✕")
+                btn.setFixedSize(18, 18)
+                btn.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+                btn.setFocusPolicy(QtCore.Qt.NoFocus)
+                btn.setStyleSheet("QPushButton { border: none; background: transparent; color: #9aa3ad; font-weight: bold; } QPushButton:hover { color: #4a5560; }")
+                btn.clicked.connect(lambda _, sd=side, n=name: self.remove_extra_key(sd, n))
+                h.addWidget(label)
+                h.addWidget(btn)
+                layout.addWidget(chip)
+            self.extra_keys_containers[side].setVisible(bool(self.extra_keys[side]))
+
     def update_all_labels(self):
         """统一更新所有与文件名相关的标签"""
         # 使用截断名用于界面，保持紧凑
@@ -435,22 +1921,7 @@ class CompareToolApp(QtWidgets.QWidget):
 
     def _read_excel_header_fast(self, file_path: str):
         """仅读取 Excel 第一行作为列名，避免导入 pandas，提升启动与选择速度。"""
-        try:
-            from openpyxl import load_workbook
-            wb = load_workbook(file_path, read_only=True, data_only=True)
-            ws = wb.active
-            row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True))
-            wb.close()
-            cols = []
-            for c in row:
-                if c is None:
-                    continue
-                text = str(c).strip()
-                if text:
-                    cols.append(text)
-            return cols
-        except Exception:
-            return []
+        return read_excel_header(file_path)
 
     # 让 QComboBox 在任意区域点击都可展开/再次点击收起
     def eventFilter(self, obj, event):
@@ -483,6 +1954,76 @@ class CompareToolApp(QtWidgets.QWidget):
     def _on_combo_close(self, combo: QtWidgets.QComboBox):
         combo.setProperty('popupOpen', False)
 
+    def _file_signature(self, file_path: str):
+        """文件签名（修改时间 + 大小），用于判断缓存的解析结果是否仍然有效。"""
+        st = os.stat(file_path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load_frame(self, side: int, file_path: str):
+        """读取指定侧的数据表；路径与文件签名均未变化时直接复用缓存。"""
+        signature = self._file_signature(file_path)
+        cached = self._frame_cache.get(side)
+        if cached is not None and cached[0] == file_path and cached[1] == signature:
+            return cached[2]
+        df = pd.read_excel(file_path, header=0, engine='openpyxl')
+        self._frame_cache[side] = (file_path, signature, df)
+        return df
+
+    # 监视模式：基于已选择的两个文件路径
+    def on_watch_toggled(self, checked: bool):
+        if checked and (not self.file1_path or not self.file2_path):
+            QMessageBox.information(self, "提示", "请先选择两个文件后再开启监视。")
+            self.watch_checkbox.blockSignals(True)
+            self.watch_checkbox.setChecked(False)
+            self.watch_checkbox.blockSignals(False)
+            return
+        self.update_watch_paths()
+        if checked:
+            self.status_label.setText("正在监视文件变化...")
+        else:
+            self._watch_debounce.stop()
+            self.status_label.setText("准备就绪")
+
+    def update_watch_paths(self):
+        """同步监视列表与当前文件路径；未开启监视时清空。"""
+        watched = self._watcher.files()
+        if watched:
+            self._watcher.removePaths(watched)
+        if not self.watch_checkbox.isChecked():
+            return
+        paths = [p for p in (self.file1_path, self.file2_path) if p and os.path.exists(p)]
+        if paths:
+            self._watcher.addPaths(sorted(set(paths)))
+
+    def _on_watched_file_changed(self, path: str):
+        # 保存时常触发多次事件，重新计时以合并为一次对比
+        self._watch_debounce.start()
+
+    def _on_watch_debounced(self):
+        if not self.watch_checkbox.isChecked():
+            return
+        paths = [p for p in (self.file1_path, self.file2_path) if p]
+        # Excel 等程序通过“写临时文件再替换”保存，文件可能短暂不存在或已从监视列表移除
+        if self._compare_running or not all(os.path.exists(p) for p in paths):
+            self._watch_debounce.start()
+            return
+        watched = set(self._watcher.files())
+        missing = [p for p in paths if p not in watched]
+        if missing:
+            self._watcher.addPaths(missing)
+        self._watch_rerun = True
+        try:
+            self.compare_files()
+        finally:
+            self._watch_rerun = False
+
+    def _notify(self, kind: str, title: str, text: str):
+        """弹窗提示；监视模式自动重跑时仅更新状态栏，避免反复弹窗打断编辑。"""
+        if self._watch_rerun:
+            self.status_label.setText(f"{datetime.now():%H:%M:%S} {title}：{text.splitlines()[0]}")
+            return
+        getattr(QMessageBox, kind)(self, title, text)
+
 
     # 新：读取两边列名并填充到列表，便于点选/筛选
     def refresh_column_lists(self):
@@ -510,7 +2051,7 @@ class CompareToolApp(QtWidgets.QWidget):
             self.index1_combo.clear()
             self.index1_combo.addItems(self.cols1)
             if prev1 in self.cols1:
-                self.index1_combo.setCurrentText(prev1)
+                self.index1_combo.setCurrentIndex(self.index1_combo.findText(prev1))
             else:
                 # 未选中时显示占位文本，避免内容区出现额外箭头
                 self.index1_combo.setCurrentIndex(-1)
@@ -525,19 +2066,22 @@ class CompareToolApp(QtWidgets.QWidget):
             self.index2_combo.clear()
             self.index2_combo.addItems(self.cols2)
             if prev2 in self.cols2:
-                self.index2_combo.setCurrentText(prev2)
+                self.index2_combo.setCurrentIndex(self.index2_combo.findText(prev2))
             else:
                 self.index2_combo.setCurrentIndex(-1)
             self.index2_combo.blockSignals(False)
             self.index2_combo.currentTextChanged.connect(self.on_index_changed)
 
-        # 选中的索引列
-        idx1 = self.index1_combo.currentText() if self.index1_combo.count() else None
-        idx2 = self.index2_combo.currentText() if self.index2_combo.count() else None
+        # 选中的索引列（含组合索引列）；已不在表头中的追加索引列一并移除
+        self.extra_keys[1] = [c for c in self.extra_keys[1] if c in self.cols1]
+        self.extra_keys[2] = [c for c in self.extra_keys[2] if c in self.cols2]
+        keys1 = set(self._selected_keys(1))
+        keys2 = set(self._selected_keys(2))
+        self.render_extra_keys()
 
         # 根据索引排除对比候选列
-        left_cols = [c for c in self.cols1 if c and c != idx1]
-        right_cols = [c for c in self.cols2 if c and c != idx2]
+        left_cols = [c for c in self.cols1 if c and c not in keys1]
+        right_cols = [c for c in self.cols2 if c and c not in keys2]
 
         # 填充候选列表
         for c in left_cols:
@@ -547,7 +2091,7 @@ class CompareToolApp(QtWidgets.QWidget):
 
         # 移除包含索引列的已选映射
         if getattr(self, 'mappings', None) is not None:
-            self.mappings = [m for m in self.mappings if m.get('col1') not in (idx1,) and m.get('col2') not in (idx2,)]
+            self.mappings = [m for m in self.mappings if m.get('col1') not in keys1 and m.get('col2') not in keys2]
 
         # 绑定过滤（重连）
         try:
@@ -579,11 +2123,110 @@ class CompareToolApp(QtWidgets.QWidget):
         self.btn_add_pair.clicked.connect(self.add_pair_from_selection)
         self.btn_auto_pair.clicked.connect(self.auto_pair_by_same_name)
 
+        # 列清单已变化，旧的匹配建议不再适用
+        self.proposals = []
+        self.render_proposals()
+
         # 重绘标签 + 初次过滤（应用搜索词与已选映射隐藏）
         self.render_tags()
         apply_filter(self.left_list, self.left_filter.text(), 'left')
         apply_filter(self.right_list, self.right_filter.text(), 'right')
 
+        # 索引下拉已重建，恢复扫描结果提示
+        self._update_index_hint()
+
+    def start_index_scan(self):
+        """在后台线程流式扫描两个文件的候选索引列，不加载 pandas、不阻塞界面。"""
+        if self._scan_cancel is not None:
+            self._scan_cancel.set()
+        self._scan_generation += 1
+        self._index_profiles = None
+        self._index_recommendations = []
+        if not self.file1_path or not self.file2_path:
+            self._update_index_hint()
+            return
+        generation = self._scan_generation
+        cancel = threading.Event()
+        self._scan_cancel = cancel
+        paths = (self.file1_path, self.file2_path)
+        signals = self._scan_signals
+
+        def _run():
+            try:
+                profiles = tuple(scan_index_candidates(p, cancel=cancel) for p in paths)
+                result = None if cancel.is_set() or None in profiles else profiles
+            except Exception as e:
+                result = e
+            try:
+                signals.finished.emit(generation, result)
+            except RuntimeError:
+                pass  # 窗口已关闭
+
+        self.index_hint_label.setText("正在后台分析索引列...")
+        self.btn_apply_index.setVisible(False)
+        threading.Thread(target=_run, name='index-scan', daemon=True).start()
+
+    def _on_index_scan_finished(self, generation: int, result):
+        if generation != self._scan_generation or result is None:
+            return
+        if isinstance(result, Exception):
+            self.index_hint_label.setText(f"索引列分析失败：{result}")
+            return
+        self._index_profiles = result
+        self._index_recommendations = recommend_index_pairs(*result)
+        self._update_index_hint()
+
+    def _describe_index_column(self, profile, name: str) -> str:
+        info = profile['columns'].get(name) if profile else None
+        if info is None:
+            return ""
+        scope = f"前 {profile['rows']} 行" if profile['truncated'] else ""
+        if info['unique'] is False:
+            return f"{scope}存在重复值"
+        if info['unique'] is None:
+            return f"{scope}前 {info['checked']} 个取值无重复，其余未能确认"
+        text = f"{scope}无重复"
+        if info['nulls']:
+            text += f"，{info['nulls']} 个空值"
+        return text
+
+    def _update_index_hint(self):
+        """根据扫描结果更新索引下拉的提示与推荐文字。"""
+        profiles = self._index_profiles
+        if profiles is None:
+            if self._scan_cancel is None or self._scan_cancel.is_set() or not (self.file1_path and self.file2_path):
+                self.index_hint_label.setText("")
+            self.btn_apply_index.setVisible(False)
+            return
+        for combo, profile in ((self.index1_combo, profiles[0]), (self.index2_combo, profiles[1])):
+            for i in range(combo.count()):
+                combo.setItemData(i, self._describe_index_column(profile, combo.itemText(i)), QtCore.Qt.ToolTipRole)
+
+        lines = []
+        recs = self._index_recommendations
+        if recs:
+            best = recs[0]
+            lines.append(f"推荐索引：{best['col1']} ⇄ {best['col2']}（两侧无重复，取值重叠约 {best['overlap']:.0%}）")
+        else:
+            lines.append("未找到两侧均无重复且取值重叠的索引列")
+        for combo, profile, name in ((self.index1_combo, profiles[0], self.file1_display_name_str),
+                                     (self.index2_combo, profiles[1], self.file2_display_name_str)):
+            col = combo.currentText()
+            info = profile['columns'].get(col) if col else None
+            if info is not None and info['unique'] is False:
+                lines.append(f"⚠ {name} 的索引列「{col}」{self._describe_index_column(profile, col)}，对比时将导出重复项")
+        self.index_hint_label.setText("\n".join(lines))
+        selected = (self.index1_combo.currentText(), self.index2_combo.currentText())
+        self.btn_apply_index.setVisible(bool(recs) and selected != (recs[0]['col1'], recs[0]['col2']))
+
+    def apply_index_recommendation(self):
+        if not self._index_recommendations:
+            return
+        best = self._index_recommendations[0]
+        # 可编辑下拉的 setCurrentText 只改文本不改选中项，这里按索引选中以触发刷新
+        self.index1_combo.setCurrentIndex(self.index1_combo.findText(best['col1']))
+        self.index2_combo.setCurrentIndex(self.index2_combo.findText(best['col2']))
+
     def on_index_changed(self, _):
         # 索引变更后刷新候选列
         self.refresh_column_lists()
@@ -611,11 +2254,96 @@ class CompareToolApp(QtWidgets.QWidget):
             if not any(m['col1'] == name and m['col2'] == name for m in self.mappings):
                 self.mappings.append({'col1': name, 'col2': name})
                 added += 1
-        if added == 0:
-            QMessageBox.information(self, "提示", "未发现可自动匹配的同名列。")
+        # 其余尚未映射的列按列名相似度给出建议
+        self.propose_fuzzy_pairs()
+        if added == 0 and not self.proposals:
+            QMessageBox.information(self, "提示", "未发现可自动匹配的列。")
         self.render_tags()
         self.apply_candidate_filters()
 
+    def propose_fuzzy_pairs(self):
+        """为未映射的列生成模糊匹配建议；开启抽样校验时剔除取值毫无重叠的建议。"""
+        used_left = {m['col1'] for m in self.mappings}
+        used_right = {m['col2'] for m in self.mappings}
+        left = [self.left_list.item(i).text() for i in range(self.left_list.count())]
+        right = [self.right_list.item(i).text() for i in range(self.right_list.count())]
+        left = [c for c in left if c not in used_left]
+        right = [c for c in right if c not in used_right]
+        proposals = propose_column_pairs(left, right, exclude=self._rejected_pairs)
+        for p in proposals:
+            p['overlap'] = None
+        if proposals and self.sample_check.isChecked() and self.file1_path and self.file2_path:
+            samples1 = sample_column_values(self.file1_path, [p['col1'] for p in proposals])
+            samples2 = sample_column_values(self.file2_path, [p['col2'] for p in proposals])
+            for p in proposals:
+                p['overlap'] = value_overlap(samples1.get(p['col1']), samples2.get(p['col2']))
+            proposals = [p for p in proposals if p['overlap'] is None or p['overlap'] > 0]
+        self.proposals = proposals
+        self.render_proposals()
+
+    def accept_proposal(self, idx: int):
+        if 0 <= idx < len(self.proposals):
+            p = self.proposals.pop(idx)
+            if not any(m['col1'] == p['col1'] and m['col2'] == p['col2'] for m in self.mappings):
+                self.mappings.append({'col1': p['col1'], 'col2': p['col2']})
+            self.render_proposals()
+            self.render_tags()
+            self.apply_candidate_filters()
+
+    def reject_proposal(self, idx: int):
+        if 0 <= idx < len(self.proposals):
+            p = self.proposals.pop(idx)
+            self._rejected_pairs.add((p['col1'], p['col2']))
+            self.render_proposals()
+
+    def accept_all_proposals(self):
+        for p in self.proposals:
+            if not any(m['col1'] == p['col1'] and m['col2'] == p['col2'] for m in self.mappings):
+                self.mappings.append({'col1': p['col1'], 'col2': p['col2']})
+        self.proposals = []
+        self.render_proposals()
+        self.render_tags()
+        self.apply_candidate_filters()
+
+    def render_proposals(self):
+        while self.proposals_layout.count():
+            it = self.proposals_layout.takeAt(0)
+            if it:
+                w = it.widget()
+                if w:
+                    w.deleteLater()
+
+        btn_style = "QPushButton { border: none; background: transparent; color: %s; font-weight: bold; } QPushButton:hover { color: %s; }"
+        for i, p in enumerate(self.proposals):
+            chip = QWidget()
+            h = QHBoxLayout(); h.setContentsMargins(12, 6, 8, 6); h.setSpacing(6)
+            chip.setLayout(h)
+            # 虚线外框区分“建议”与已确认的对比项
+            chip.setStyleSheet("QWidget { border: 1px dashed #b9c7dc; border-radius: 14px; background: #fbfcfe; }")
+            detail = f"相似度 {p['score']:.0%}"
+            if p.get('overlap') is not None:
+                detail += f"，取值重叠 {p['overlap']:.0%}"
+            label = QLabel(f"{p['col1']}  ⇄  {p['col2']}")
+            label.setToolTip(detail)
+            accept = QPushButton("✓")
+            accept.setFixedSize(20, 20)
+            accept.setToolTip(f"加入对比项（{detail}）")
+            accept.setStyleSheet(btn_style % ('#3a9b5c', '#24733f'))
+            reject = QPushButton("✕")
+            reject.setFixedSize(20, 20)
+            reject.setToolTip("忽略该建议")
+            reject.setStyleSheet(btn_style % ('#9aa3ad', '#4a5560'))
+            for b in (accept, reject):
+                b.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+                b.setFocusPolicy(QtCore.Qt.NoFocus)
+            accept.clicked.connect(lambda _, idx=i: self.accept_proposal(idx))
+            reject.clicked.connect(lambda _, idx=i: self.reject_proposal(idx))
+            h.addWidget(label)
+            h.addWidget(accept)
+            h.addWidget(reject)
+            self.proposals_layout.addWidget(chip)
+        self.proposals_box.setVisible(bool(self.proposals))
+
     def remove_tag(self, idx: int):
         if 0 <= idx < len(self.mappings):
             del self.mappings[idx]
@@ -677,177 +2405,137 @@ class CompareToolApp(QtWidgets.QWidget):
             QMessageBox.critical(self, "错误", "请先选择两个文件")
             return
 
-        index1 = self.index1_combo.currentText().strip() if self.index1_combo.count() else ''
-        index2 = self.index2_combo.currentText().strip() if self.index2_combo.count() else ''
+        index1 = self._selected_keys(1)
+        index2 = self._selected_keys(2)
         if not index1 or not index2:
             QMessageBox.critical(self, "错误", "请填写索引列")
             return
+        if len(index1) != len(index2):
+            QMessageBox.critical(self, "错误", "两个文件的索引列数量不一致，请按相同顺序选择组合索引列")
+            return
 
+        first_compare = 'first_compare' not in _startup_stats
+        t_click = time.perf_counter()
+        self._compare_running = True
         try:
-            global pd
+            # pandas 由后台预热导入；尚未完成时等待预热，期间保持界面可响应
             if pd is None:
-                # 延迟导入 pandas，避免影响启动
-                pd = importlib.import_module('pandas')
+                self.status_label.setText("正在加载数据组件...")
+                self.compare_button.setEnabled(False)
+                try:
+                    wait_for_pandas(QtWidgets.QApplication.processEvents)
+                finally:
+                    self.compare_button.setEnabled(True)
+            if first_compare:
+                _startup_stats['pandas_wait'] = time.perf_counter() - t_click
             self.status_label.setText("正在读取文件...")
-            df1 = pd.read_excel(self.file1_path, header=0, engine='openpyxl')
-            df2 = pd.read_excel(self.file2_path, header=0, engine='openpyxl')
+            df1 = self._load_frame(1, self.file1_path)
+            df2 = self._load_frame(2, self.file2_path)
 
-            if index1 not in df1.columns or index2 not in df2.columns:
-                QMessageBox.critical(self, "错误", "找不到指定的索引列，请检查列名是否正确")
-                return
-            
             # 导出与结果展示使用完整文件名，避免被截断
             file1_name = getattr(self, 'file1_display_name_str_full', self.file1_display_name_str)
             file2_name = getattr(self, 'file2_display_name_str_full', self.file2_display_name_str)
+            output_format = self.format_combo.currentData() or 'xlsx'
+            check_output_format(output_format)
+            # 使用时间戳命名，避免覆盖；若重名则追加计数后缀
+            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+            ext = f".{output_format}"
 
+            # 结果文件一算好就交给后台写出（大表在子进程中写），与后续的去重、对比计算并行；全部写完后再提示
+            writer = BackgroundWriter()
+            self.compare_button.setEnabled(False)
+            try:
+                self.status_label.setText("正在处理重复值...")
+                all_duplicates = find_duplicates(df1, df2, index1, index2, file1_name, file2_name)
+                # 重复索引文件在检查对比列之前提交：对比列无效时同样导出
+                if not all_duplicates.empty:
+                    dup_filename = unique_output_filename(f"两个表格中重复的名字_{ts}", ext)
+                    writer.submit(dup_filename, write_frame_file, all_duplicates, output_format,
+                                  rows=len(all_duplicates))
+                    self.status_label.setText(f"正在后台导出重复索引：{dup_filename}")
+
+                # 机器可读格式：各结果一算好就提交写出，不等其余结果
+                def on_result(name, df):
+                    label = {'summary': '差异汇总', 'detailed': '详细对比数据'}[name]
+                    if name == 'detailed':
+                        df = df.reset_index()
+                    filename = unique_output_filename(f"对比的结果_{ts}_{label}", ext)
+                    writer.submit(filename, write_frame_file, df, output_format, rows=len(df))
+
+                self.status_label.setText("正在对比数据...")
+                # 从标签式配置读取映射
+                summary_df, detailed_df = compare_frames(
+                    df1, df2, index1, index2, getattr(self, 'mappings', []), file1_name, file2_name,
+                    on_result=None if output_format == 'xlsx' else on_result,
+                )
 
-            self.status_label.setText("正在处理重复值...")
-            duplicates_df1 = df1[df1.duplicated(index1, keep=False)].copy()
-            duplicates_df1.loc[:, '来源'] = file1_name
-            duplicates_df2 = df2[df2.duplicated(index2, keep=False)].copy()
-            duplicates_df2.loc[:, '来源'] = file2_name
-            all_duplicates = pd.concat([duplicates_df1, duplicates_df2])
-            if not all_duplicates.empty:
-                dup_ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-                dup_base = f"两个表格中重复的名字_{dup_ts}"
-                dup_filename = f"{dup_base}.xlsx"
-                if os.path.exists(dup_filename):
-                    n = 1
-                    while os.path.exists(f"{dup_base}_{n}.xlsx"):
-                        n += 1
-                    dup_filename = f"{dup_base}_{n}.xlsx"
-                all_duplicates.to_excel(dup_filename, index=False)
-                self.status_label.setText(f"已导出重复索引：{dup_filename}")
-            
-            df1 = df1.drop_duplicates(subset=[index1], keep='first').set_index(index1)
-            df2 = df2.drop_duplicates(subset=[index2], keep='first').set_index(index2)
-
-            common_index = df1.index.intersection(df2.index)
-            df1_common = df1.loc[common_index]
-            df2_common = df2.loc[common_index]
-
-            self.status_label.setText("正在对比数据...")
-            
-            # 从标签式配置读取映射，并过滤无效列
-            column_mappings = []
-            for m in getattr(self, 'mappings', []):
-                col1 = str(m.get('col1', '')).strip()
-                col2 = str(m.get('col2', '')).strip()
-                if col1 and col2 and col1 in df1_common.columns and col2 in df2_common.columns:
-                    column_mappings.append({'col1': col1, 'col2': col2})
-
-            if not column_mappings:
-                QMessageBox.warning(self, "注意", "没有有效的列进行对比。请检查您是否已填写对比列，以及列名是否正确。")
-                self.status_label.setText("准备就绪")
+                output_filename = None
+                if output_format == 'xlsx':
+                    if summary_df is not None:
+                        output_filename = unique_output_filename(f"对比的结果_{ts}")
+                        writer.submit(output_filename, write_report_workbook, summary_df, detailed_df,
+                                      rows=len(summary_df) + len(detailed_df))
+                else:
+                    key_only_df = key_only_rows(df1, df2, index1, index2, file1_name, file2_name)
+                    if not key_only_df.empty:
+                        filename = unique_output_filename(f"对比的结果_{ts}_仅一侧存在", ext)
+                        writer.submit(filename, write_frame_file, key_only_df, output_format,
+                                      rows=len(key_only_df))
+
+                self.status_label.setText("正在写出结果文件...")
+                written = writer.wait(QtWidgets.QApplication.processEvents)
+            except BaseException:
+                writer.close(QtWidgets.QApplication.processEvents)
+                raise
+            finally:
+                self.compare_button.setEnabled(True)
+
+            if output_format != 'xlsx':
+                self.status_label.setText("对比完成" if summary_df is not None else "未发现不匹配项")
+                head = "对比完成！" if summary_df is not None else "所有对比列的数据完全一致！"
+                files = "\n".join(f"- {f}" for f in written)
+                self._notify('information', "完成", f"{head}结果已保存为 {output_format.upper()}：\n{files}" if written else head)
                 return
 
-            # 统一归一化函数：去空白、去千分位、数字转为一致格式（避免 0 与 0.0 误判）
-            def _normalize_series(s: 'pd.Series') -> 'pd.Series':
-                # 缺失值占位，避免与空字符串混淆
-                s = s.copy()
-                s = s.where(~s.isna(), other="__MISSING__")
-                # 转字符串并去除首尾空白
-                s_str = s.astype(str).str.strip()
-                # 去除可能的千分位逗号
-                s_clean = s_str.str.replace(',', '', regex=False)
-                # 能转数字的统一为数字格式，再转为字符串，去除多余的0和小数点
-                s_num = pd.to_numeric(s_clean, errors='coerce')
-                result = s_clean.copy()
-                mask = s_num.notna()
-                # 使用通用格式，最多15位有效数字，避免 1.0 与 1、以及 1.2300 与 1.23 的差异
-                result.loc[mask] = s_num.loc[mask].map(lambda x: f"{x:.15g}")
-                return result
-
-            overall_mismatch_mask = pd.Series(False, index=df1_common.index)
-            for mapping in column_mappings:
-                s1 = _normalize_series(df1_common[mapping['col1']])
-                s2 = _normalize_series(df2_common[mapping['col2']])
-                overall_mismatch_mask |= (s1 != s2)
-            
-            mismatch_indices = df1_common.index[overall_mismatch_mask]
-
-            if mismatch_indices.empty:
-                QMessageBox.information(self, "完成", "所有对比列的数据完全一致！")
+            if summary_df is None:
                 self.status_label.setText("未发现不匹配项")
+                self._notify('information', "完成", "所有对比列的数据完全一致！")
                 return
 
-            mismatched_df1 = df1_common.loc[mismatch_indices]
-            mismatched_df2 = df2_common.loc[mismatch_indices]
-            
-            # 仅保留存在差异的列与行，避免把相同数据一并导出
-            detailed_result_list = []
-            for mapping in column_mappings:
-                col1, col2 = mapping['col1'], mapping['col2']
-
-                # 针对每一对列单独计算差异掩码（使用归一化后的值）
-                pair_mask = (
-                    _normalize_series(df1_common[col1])
-                    != _normalize_series(df2_common[col2])
-                )
-                pair_indices = df1_common.index[pair_mask]
-                if pair_indices.empty:
-                    continue
-
-                df1_subset = (
-                    df1_common.loc[pair_indices, [col1]]
-                    .rename(columns={col1: f"{file1_name}_{col1}"})
-                )
-                df2_subset = (
-                    df2_common.loc[pair_indices, [col2]]
-                    .rename(columns={col2: f"{file2_name}_{col2}"})
-                )
-                detailed_result_list.extend([df1_subset, df2_subset])
-
-            # 若无任何差异对，构造一个空表；否则按索引对齐横向拼接
-            if detailed_result_list:
-                detailed_df = pd.concat(detailed_result_list, axis=1)
-            else:
-                detailed_df = pd.DataFrame(index=mismatch_indices)
-
-            summary_records = []
-            for index_val in mismatch_indices:
-                for mapping in column_mappings:
-                    col1, col2 = mapping['col1'], mapping['col2']
-                    val1 = df1_common.loc[index_val, col1]
-                    val2 = df2_common.loc[index_val, col2]
-
-                    # 使用与总体一致的归一化比较，避免 0 与 0.0、空格等导致的误报
-                    n1 = _normalize_series(pd.Series([val1])).iloc[0]
-                    n2 = _normalize_series(pd.Series([val2])).iloc[0]
-                    if n1 != n2:
-                        summary_records.append({
-                            index1: index_val,
-                            '不一致的列': f"{col1} vs {col2}",
-                            f'{file1_name}的值': val1,
-                            f'{file2_name}的值': val2,
-                        })
-            summary_df = pd.DataFrame(summary_records)
-
-            # 使用时间戳命名，避免覆盖；若重名则追加计数后缀
-            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-            base = f"对比的结果_{ts}"
-            output_filename = f"{base}.xlsx"
-            if os.path.exists(output_filename):
-                n = 1
-                while os.path.exists(f"{base}_{n}.xlsx"):
-                    n += 1
-                output_filename = f"{base}_{n}.xlsx"
-            with pd.ExcelWriter(output_filename, engine='openpyxl') as writer:
-                summary_df.to_excel(writer, sheet_name='差异汇总', index=False)
-                detailed_df.to_excel(writer, sheet_name='详细对比数据', index=True)
-            
-            QMessageBox.information(self, "完成", f"对比完成！结果已保存到 '{output_filename}'。\n\n"
+            self.status_label.setText("对比完成")
+            self._notify('information', "完成", f"对比完成！结果已保存到 '{output_filename}'。\n\n"
                                                "文件中包含两个Sheet：\n"
                                                "1. 差异汇总：清晰列出每一项不同。\n"
                                                "2. 详细对比数据：并排展示所有差异行的数据。")
-            self.status_label.setText("对比完成")
 
+        except CompareError as e:
+            self.status_label.setText("准备就绪")
+            self._notify(e.kind, "错误" if e.kind == 'critical' else "注意", str(e))
         except Exception as e:
-            QMessageBox.critical(self, "错误", f"对比过程中发生错误: {e}")
             self.status_label.setText("对比过程中发生错误")
+            self._notify('critical', "错误", f"对比过程中发生错误: {e}")
+        finally:
+            self._compare_running = False
+            if first_compare:
+                _startup_stats['first_compare'] = time.perf_counter() - t_click
+                _profile_log(f"首次对比耗时 {_startup_stats['first_compare']:.3f}s"
+                             f"（其中等待 pandas {_startup_stats.get('pandas_wait', 0.0):.3f}s）")
+
+
+def _on_event_loop_idle():
+    """窗口首次显示、事件循环空闲后调用：记录启动耗时并开始后台预热。"""
+    _startup_stats['time_to_window'] = time.perf_counter() - _T_PROCESS_START
+    _profile_log(f"窗口可用耗时 {_startup_stats['time_to_window']:.3f}s")
+    start_heavy_warmup()
+
 
 if __name__ == "__main__":
-    app = QtWidgets.QApplication(sys.argv)
+    multiprocessing.freeze_support()  # 打包为可执行文件时，写出子进程从这里进入
+    if '--serve' in sys.argv:
+        run_compare_service(sys.argv[1:])
+        sys.exit(0)
+    app = QtWidgets.QApplication([a for a in sys.argv if a != '--profile-startup'])
     window = CompareToolApp()
     window.show()
+    QtCore.QTimer.singleShot(0, _on_event_loop_idle)
     sys.exit(app.exec_())
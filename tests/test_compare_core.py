@@ -0,0 +1,241 @@
+"""对比核心（连接键、按类型比较、列名匹配）的回归测试。
+
+运行：python -m pytest -q
+"""
+import os
+import sys
+
+import numpy as np
+import pandas
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import excel_compare as ec  # noqa: E402
+
+# 主程序延迟导入 pandas；测试中直接使用已导入的模块
+ec.pd = pandas
+pd = pandas
+
+
+def reference_compare(df1, df2, index1, index2, mappings, file1_name, file2_name):
+    """改写前的单列索引对比逻辑（drop_duplicates + set_index + 字符串归一化），作为对照。"""
+    df1 = df1.drop_duplicates(subset=[index1], keep='first').set_index(index1)
+    df2 = df2.drop_duplicates(subset=[index2], keep='first').set_index(index2)
+    common_index = df1.index.intersection(df2.index)
+    df1_common = df1.loc[common_index]
+    df2_common = df2.loc[common_index]
+
+    overall = pd.Series(False, index=df1_common.index)
+    for m in mappings:
+        overall |= ec._normalize_series(df1_common[m['col1']]) != ec._normalize_series(df2_common[m['col2']])
+    mismatch_indices = df1_common.index[overall]
+    if mismatch_indices.empty:
+        return None, None
+
+    detailed = []
+    for m in mappings:
+        col1, col2 = m['col1'], m['col2']
+        pair_mask = ec._normalize_series(df1_common[col1]) != ec._normalize_series(df2_common[col2])
+        pair_indices = df1_common.index[pair_mask]
+        if pair_indices.empty:
+            continue
+        detailed.append(df1_common.loc[pair_indices, [col1]].rename(columns={col1: f"{file1_name}_{col1}"}))
+        detailed.append(df2_common.loc[pair_indices, [col2]].rename(columns={col2: f"{file2_name}_{col2}"}))
+    detailed_df = pd.concat(detailed, axis=1)
+
+    records = []
+    for index_val in mismatch_indices:
+        for m in mappings:
+            col1, col2 = m['col1'], m['col2']
+            val1 = df1_common.loc[index_val, col1]
+            val2 = df2_common.loc[index_val, col2]
+            n1 = ec._normalize_series(pd.Series([val1])).iloc[0]
+            n2 = ec._normalize_series(pd.Series([val2])).iloc[0]
+            if n1 != n2:
+                records.append({
+                    index1: index_val,
+                    '不一致的列': f"{col1} vs {col2}",
+                    f'{file1_name}的值': val1,
+                    f'{file2_name}的值': val2,
+                })
+    return pd.DataFrame(records), detailed_df
+
+
+def _random_frames(seed, n=300):
+    """两侧列类型组合与改写前结果一致的随机表：数值对数值、文本对文本、数值对含非数字的文本。"""
+    rng = np.random.default_rng(seed)
+    keys1 = rng.integers(0, n, size=n)           # 含重复键
+    keys2 = rng.integers(n // 3, n + n // 3, size=n)  # 部分键只在一侧
+    amount1 = rng.integers(0, 5, size=n).astype('float64')
+    amount1[rng.random(n) < 0.1] = np.nan
+    amount2 = amount1.copy()
+    flip = rng.random(n) < 0.2
+    amount2[flip] = amount2[flip] + 1.5
+    amount2[rng.random(n) < 0.05] = np.nan
+    names = np.array(['alpha', 'beta', 'gamma', 'δ', ''])
+    name1 = names[rng.integers(0, len(names), size=n)].astype(object)
+    name2 = name1.copy()
+    pad = rng.random(n) < 0.3
+    name2[pad] = [f"  {v} " for v in name2[pad]]
+    change = rng.random(n) < 0.15
+    name2[change] = names[rng.integers(0, len(names), size=change.sum())]
+    qty1 = rng.integers(0, 3000, size=n)
+    qty2 = np.array([f"{v:,}" if rng.random() < 0.7 else ('n/a' if rng.random() < 0.5 else str(v + 1))
+                     for v in qty1], dtype=object)
+    df1 = pd.DataFrame({'id': keys1, 'amount': amount1, 'name': name1, 'qty': qty1})
+    df2 = pd.DataFrame({'编号': keys2, '金额': amount2, '名称': name2, '数量': qty2})
+    # 同一位置两侧键相同，保证公共键足够多
+    df2.loc[: n // 2, '编号'] = df1.loc[: n // 2, 'id'].to_numpy()
+    return df1, df2
+
+
+MAPPINGS = [
+    {'col1': 'amount', 'col2': '金额'},
+    {'col1': 'name', 'col2': '名称'},
+    {'col1': 'qty', 'col2': '数量'},
+]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_single_key_matches_reference(seed):
+    df1, df2 = _random_frames(seed)
+    expected_summary, expected_detail = reference_compare(df1, df2, 'id', '编号', MAPPINGS, 'a.xlsx', 'b.xlsx')
+    summary, detail = ec.compare_frames(df1, df2, 'id', '编号', MAPPINGS, 'a.xlsx', 'b.xlsx')
+    pd.testing.assert_frame_equal(summary, expected_summary, check_dtype=False)
+    # 两侧索引列名不同时，改写前的详细表索引没有名称，现在以左侧索引列命名
+    assert detail.index.name == 'id'
+    pd.testing.assert_frame_equal(detail, expected_detail, check_dtype=False, check_names=False)
+
+
+def test_single_key_text_keys_and_equivalent_numbers():
+    df1 = pd.DataFrame({'k': ['x', 'y', 'z', 'y', 'w'], 'v': [0, 1, 1.23, 9, 5]})
+    df2 = pd.DataFrame({'k': ['z', 'y', 'x', 'v'], 'v': ['1.2300', ' 1 ', '0.0', '5']})
+    mappings = [{'col1': 'v', 'col2': 'v'}]
+    assert ec.compare_frames(df1, df2, 'k', 'k', mappings, 'a', 'b') == (None, None)
+    assert reference_compare(df1, df2, 'k', 'k', mappings, 'a', 'b') == (None, None)
+
+    df2.loc[1, 'v'] = '2'
+    expected_summary, expected_detail = reference_compare(df1, df2, 'k', 'k', mappings, 'a', 'b')
+    summary, detail = ec.compare_frames(df1, df2, 'k', 'k', mappings, 'a', 'b')
+    pd.testing.assert_frame_equal(summary, expected_summary, check_dtype=False)
+    pd.testing.assert_frame_equal(detail, expected_detail, check_dtype=False)
+    assert summary['k'].tolist() == ['y']
+
+
+def test_composite_key_with_missing_values():
+    df1 = pd.DataFrame({
+        'region': ['N', 'N', None, None, 'S', 'S'],
+        'code': [1.0, np.nan, 2.0, np.nan, np.nan, 3.0],
+        'v': [10, 20, 30, 40, 50, 60],
+    })
+    df2 = pd.DataFrame({
+        '区域': ['S', None, 'N', None, 'N', 'S'],
+        '编码': [np.nan, np.nan, np.nan, 2.0, 1.0, 4.0],
+        'v': [50, 41, 21, 30, 10, 60],
+    })
+    codes1, codes2 = ec.build_join_keys(df1, df2, ['region', 'code'], ['区域', '编码'])
+    assert codes1.dtype == np.int64 and codes2.dtype == np.int64
+
+    def tuples(df, cols):
+        # 缺失值视为一个普通取值：None 与 NaN 统一为同一个占位
+        return [tuple('<NA>' if pd.isna(v) else v for v in row) for row in df[cols].itertuples(index=False)]
+
+    t1, t2 = tuples(df1, ['region', 'code']), tuples(df2, ['区域', '编码'])
+    all_codes, all_tuples = list(codes1) + list(codes2), t1 + t2
+    for i in range(len(all_codes)):
+        for j in range(len(all_codes)):
+            assert (all_codes[i] == all_codes[j]) == (all_tuples[i] == all_tuples[j])
+
+    summary, detail = ec.compare_frames(df1, df2, ['region', 'code'], ['区域', '编码'],
+                                        [{'col1': 'v', 'col2': 'v'}], 'a', 'b')
+    # (N, NaN): 20 vs 21，(NaN, NaN): 40 vs 41；(S, 3.0) 与 (S, 4.0) 不是同一键
+    assert summary[['region', 'code', 'a的值', 'b的值']].to_dict('records') == [
+        {'region': 'N', 'code': pytest.approx(np.nan, nan_ok=True), 'a的值': 20, 'b的值': 21},
+        {'region': None, 'code': pytest.approx(np.nan, nan_ok=True), 'a的值': 40, 'b的值': 41},
+    ]
+    assert isinstance(detail.index, pd.MultiIndex)
+    assert list(detail.index.names) == ['region', 'code']
+    assert detail['a_v'].tolist() == [20, 40]
+    assert detail['b_v'].tolist() == [21, 41]
+
+
+def test_first_by_key_keeps_first_row_and_labels():
+    df = pd.DataFrame({'a': ['x', 'x', 'y', 'x'], 'b': [1, 2, 1, 1], 'v': [1, 2, 3, 4]})
+    codes, _ = ec.build_join_keys(df, df.iloc[:0], ['a', 'b'], ['a', 'b'])
+    data, labels = ec._first_by_key(df, codes, ['a', 'b'])
+    assert data['v'].tolist() == [1, 2, 3]
+    assert list(data.columns) == ['v']
+    index = ec._key_labels(labels, ['a', 'b'], data.index[[2, 0]])
+    assert list(index) == [('y', 1), ('x', 1)]
+
+    single_codes, _ = ec.build_join_keys(df, df.iloc[:0], ['a'], ['a'])
+    data, labels = ec._first_by_key(df, single_codes, ['a'])
+    index = ec._key_labels(labels, ['a'], data.index)
+    assert index.name == 'a' and list(index) == ['x', 'y']
+
+
+def test_join_keys_refactorize_on_overflow(monkeypatch):
+    # 70 个二值列：组合空间超过 2**63，触发重新压缩编码的分支
+    calls = []
+    factorize = pd.factorize
+    monkeypatch.setattr(pd, 'factorize', lambda values, **kw: calls.append(values) or factorize(values, **kw))
+    rng = np.random.default_rng(0)
+    n_cols, n_rows = 70, 40
+    bits = rng.integers(0, 2, size=(n_rows, n_cols))
+    bits[20:30] = bits[:10]            # 两表间相同的行
+    bits[30:35, :-1] = bits[:5, :-1]   # 只有最后一列不同的行
+    cols = [f"c{i}" for i in range(n_cols)]
+    frame = pd.DataFrame(bits, columns=cols)
+    df1, df2 = frame.iloc[:20].reset_index(drop=True), frame.iloc[20:].reset_index(drop=True)
+    codes1, codes2 = ec.build_join_keys(df1, df2, cols, cols)
+    assert len(calls) > n_cols
+    monkeypatch.undo()
+
+    all_codes = np.concatenate([codes1, codes2])
+    all_rows = [tuple(r) for r in bits]
+    for i in range(n_rows):
+        for j in range(n_rows):
+            assert (all_codes[i] == all_codes[j]) == (all_rows[i] == all_rows[j])
+
+    df1 = df1.assign(v=range(20))
+    df2 = df2.assign(v=[0, 1, 2, 3, 4, 5, 6, 7, 8, 99] + list(range(10)))
+    summary, _ = ec.compare_frames(df1, df2, cols, cols, [{'col1': 'v', 'col2': 'v'}], 'a', 'b')
+    assert summary[['a的值', 'b的值']].values.tolist() == [[9, 99]]
+
+
+def test_date_and_text_columns():
+    dates = pd.Series(pd.to_datetime(['2024-01-05', '2024-01-06', '2024-06-01', '2024-03-02', None]))
+    texts = pd.Series(['2024/1/5', '2024年1月6日', '06/01/2024', ' 2024.3.2 ', ''], dtype=object)
+    kind1, kind2 = ec.detect_column_kind(dates), ec.detect_column_kind(texts)
+    assert (kind1, kind2) == ('datetime', 'text')
+    # 月日顺序有歧义的 06/01/2024 不按日期解析，按文本与日期比较为不一致；空白与缺失视为相同
+    assert ec.pair_mismatch(dates, texts, kind1, kind2).tolist() == [False, False, True, False, False]
+
+    with_time = pd.Series(['2024-01-05 08:30', '2024-01-05'], dtype=object)
+    stamps = pd.Series(pd.to_datetime(['2024-01-05 08:30:00', '2024-01-05 00:00:01']))
+    assert ec.pair_mismatch(stamps, with_time, 'datetime', 'datetime').tolist() == [False, True]
+
+
+def test_boolean_and_numeric_columns():
+    flags = pd.Series([True, False, True, False, None], dtype=object)
+    numbers = pd.Series([1, 0, 0, 2, np.nan])
+    assert ec.detect_column_kind(flags) == 'boolean'
+    assert ec.detect_column_kind(numbers) == 'numeric'
+    # 2 无法按布尔解析，回退为字符串比较；两侧缺失视为相同
+    assert ec.pair_mismatch(flags, numbers, 'boolean', 'numeric').tolist() == [False, False, True, True, False]
+
+    words = pd.Series(['TRUE', ' no ', '是', 'y'], dtype=object)
+    bools = pd.Series([True, False, True, False])
+    assert ec.detect_column_kind(words) == 'boolean'
+    assert ec.pair_mismatch(bools, words, 'boolean', 'boolean').tolist() == [False, False, False, True]
+
+
+def test_propose_column_pairs_recall_and_exclude():
+    left = [f"客户信息_字段{i:04d}" for i in range(1500)]
+    right = [f"客户信息字段{i:04d}" for i in range(1500)]
+    proposals = ec.propose_column_pairs(left, right)
+    assert {(p['col1'], p['col2']) for p in proposals} == set(zip(left, right))
+
+    proposals = ec.propose_column_pairs(['Amount (USD)', 'Name'], ['amount_usd', 'name', 'names'],
+                                        exclude=[('Name', 'name')])
+    assert [(p['col1'], p['col2']) for p in proposals] == [('Amount (USD)', 'amount_usd'), ('Name', 'names')]